@@ -3,8 +3,10 @@
 """
 简单的HTTP服务器，支持GET和POST请求
 用于前端开发，代理POST请求到后端服务
+WebSocket升级请求整体转发到后端，握手之后按字节流双向透传（不解析帧）
 """
 
+import http.client
 import http.server
 import socketserver
 import urllib.request
@@ -12,17 +14,568 @@ import urllib.parse
 import json
 import sys
 import os
+import socket
+import select
+import selectors
+import threading
+import time
+import math
+from concurrent.futures import ThreadPoolExecutor
 from urllib.error import URLError
 
+BACKEND_HOST = 'localhost'
+BACKEND_PORT = 3000
+
+# WebSocket隧道空闲超时（秒），两个方向都没有数据时关闭
+WS_IDLE_TIMEOUT = 300
+WS_BUFFER_SIZE = 65536
+
+# 准入控制：按路径前缀（最长匹配）限制同时转发到后端的请求数，超出的排队等待，队列满时直接拒绝
+# 预测接口每个请求都会在后端启动一个Python进程
+ADMISSION_LIMITS = {
+    '/api/ai/predict': {'concurrency': 2, 'queue': 8},
+    '/api/llm/': {'concurrency': 4, 'queue': 16},
+}
+# 排队超时（秒），超时后返回 503
+ADMISSION_QUEUE_TIMEOUT = 15
+
+# 每个客户端IP的令牌桶：每秒补充的令牌数和桶容量（允许的突发请求数），只作用于 /api/
+RATE_LIMIT_RATE = 5.0
+RATE_LIMIT_BURST = 20
+
+# 批量接口 /api/batch：单批最多子请求数、并发转发的工作线程数、单个子请求超时（秒）
+BATCH_PATH = '/api/batch'
+BATCH_MAX_ITEMS = 20
+BATCH_WORKERS = 8
+BATCH_ITEM_TIMEOUT = 10
+
+
+class WebSocketRelay:
+    """单线程 selectors 事件循环，透传所有WebSocket隧道的字节流"""
+    
+    def __init__(self, idle_timeout=WS_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.pending = []
+        self.tunnels = {}
+        # 唤醒事件循环以注册新隧道
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self.stats = {'active': 0, 'opened': 0, 'closed': 0, 'idle_timeouts': 0,
+                      'bytes_to_backend': 0, 'bytes_to_client': 0}
+        self.thread = threading.Thread(target=self._run, name='ws-relay', daemon=True)
+        self.thread.start()
+    
+    def add(self, client, backend, initial=b''):
+        """接管一对已握手的连接；initial 为客户端已发出、尚未转发的字节"""
+        with self.lock:
+            self.pending.append((client, backend, initial))
+            self.stats['opened'] += 1
+            self.stats['active'] += 1
+            self.stats['bytes_to_backend'] += len(initial)
+        self._wake_w.send(b'\0')
+    
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, idle_timeout=self.idle_timeout)
+    
+    def _register(self, client, backend, initial):
+        client.setblocking(False)
+        backend.setblocking(False)
+        tunnel = {'client': client, 'backend': backend, 'last_active': time.monotonic(),
+                  # 发往各端尚未写完的数据；有积压时暂停读取对端（背压）
+                  'out': {client: bytearray(), backend: bytearray(initial)},
+                  # 已读到EOF的一端；发往对端的积压写完后对对端 shutdown(SHUT_WR) 半关闭，两个方向都结束后关闭隧道
+                  'eof': set(), 'shut': set(),
+                  'events': {client: 0, backend: 0}}
+        self.tunnels[id(tunnel)] = tunnel
+        self._update_events(tunnel)
+    
+    def _update_events(self, tunnel):
+        client, backend = tunnel['client'], tunnel['backend']
+        for sock, peer in ((client, backend), (backend, client)):
+            events = 0
+            if not tunnel['out'][peer] and sock not in tunnel['eof']:
+                events |= selectors.EVENT_READ
+            if tunnel['out'][sock]:
+                events |= selectors.EVENT_WRITE
+            current = tunnel['events'][sock]
+            if events == current:
+                continue
+            if not events:
+                self.selector.unregister(sock)
+            elif not current:
+                self.selector.register(sock, events, (tunnel, peer))
+            else:
+                self.selector.modify(sock, events, (tunnel, peer))
+            tunnel['events'][sock] = events
+    
+    def _close(self, tunnel, timed_out=False):
+        if self.tunnels.pop(id(tunnel), None) is None:
+            return
+        for sock in (tunnel['client'], tunnel['backend']):
+            if tunnel['events'][sock]:
+                self.selector.unregister(sock)
+            try:
+                sock.close()
+            except OSError:
+                pass
+        with self.lock:
+            self.stats['active'] -= 1
+            self.stats['closed'] += 1
+            if timed_out:
+                self.stats['idle_timeouts'] += 1
+    
+    def _finish(self, tunnel, sock):
+        """sock 对端已EOF且发往 sock 的积压已写完时半关闭 sock 的写方向；返回隧道是否两个方向都已结束"""
+        peer = tunnel['backend'] if sock is tunnel['client'] else tunnel['client']
+        if peer in tunnel['eof'] and not tunnel['out'][sock] and sock not in tunnel['shut']:
+            tunnel['shut'].add(sock)
+            sock.shutdown(socket.SHUT_WR)
+        return len(tunnel['shut']) == 2
+    
+    def _transfer(self, tunnel, sock, peer, mask):
+        if mask & selectors.EVENT_WRITE:
+            out = tunnel['out'][sock]
+            sent = sock.send(out)
+            del out[:sent]
+            if self._finish(tunnel, sock):
+                self._close(tunnel)
+                return
+        if mask & selectors.EVENT_READ:
+            data = sock.recv(WS_BUFFER_SIZE)
+            if not data:
+                # 对端不再发送：先把已缓冲的数据（可能含关闭帧）写完，再把EOF传给另一端
+                tunnel['eof'].add(sock)
+                if self._finish(tunnel, peer):
+                    self._close(tunnel)
+                    return
+                tunnel['last_active'] = time.monotonic()
+                self._update_events(tunnel)
+                return
+            received = len(data)
+            out = tunnel['out'][peer]
+            if not out:
+                try:
+                    sent = peer.send(data)
+                except BlockingIOError:
+                    sent = 0
+                data = data[sent:]
+            out.extend(data)
+            key = 'bytes_to_backend' if sock is tunnel['client'] else 'bytes_to_client'
+            with self.lock:
+                self.stats[key] += received
+        tunnel['last_active'] = time.monotonic()
+        self._update_events(tunnel)
+    
+    def _run(self):
+        last_sweep = time.monotonic()
+        while True:
+            for key, mask in self.selector.select(timeout=1.0):
+                if key.data is None:
+                    try:
+                        self._wake_r.recv(1024)
+                    except BlockingIOError:
+                        pass
+                    with self.lock:
+                        pending, self.pending = self.pending, []
+                    for client, backend, initial in pending:
+                        self._register(client, backend, initial)
+                    continue
+                tunnel, peer = key.data
+                if id(tunnel) not in self.tunnels:
+                    continue
+                try:
+                    self._transfer(tunnel, key.fileobj, peer, mask)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError:
+                    self._close(tunnel)
+            
+            # 空闲超时检查
+            now = time.monotonic()
+            if now - last_sweep >= 1.0:
+                last_sweep = now
+                for tunnel in [t for t in self.tunnels.values() if now - t['last_active'] > self.idle_timeout]:
+                    self._close(tunnel, timed_out=True)
+
+
+class TokenBucketLimiter:
+    """按客户端IP的令牌桶限流"""
+    
+    def __init__(self, rate=RATE_LIMIT_RATE, burst=RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.lock = threading.Lock()
+        # ip -> [令牌数, 上次更新时间]
+        self.buckets = {}
+    
+    def acquire(self, client_ip):
+        """取一个令牌；成功返回0，否则返回需要等待的秒数"""
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(client_ip)
+            if bucket is None:
+                if len(self.buckets) >= 10000:
+                    self._prune(now)
+                bucket = self.buckets[client_ip] = [float(self.burst), now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return 0
+            bucket[0] = tokens
+            return (1 - tokens) / self.rate
+    
+    def _prune(self, now):
+        """丢弃已经补满的桶（与新建的桶等价）"""
+        full = self.burst / self.rate
+        for ip in [ip for ip, (_, last) in self.buckets.items() if now - last >= full]:
+            del self.buckets[ip]
+
+
+class PathGate:
+    """单个路径前缀的并发上限 + 有界等待队列"""
+    
+    def __init__(self, prefix, concurrency, queue):
+        self.prefix = prefix
+        self.concurrency = concurrency
+        self.queue = queue
+        self.cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        # 请求处理时长的指数平均，用于估算 Retry-After
+        self.avg_duration = 1.0
+    
+    def enter(self, timeout):
+        """返回 (是否放行, 是否排过队, 拒绝原因)"""
+        with self.cond:
+            if self.active < self.concurrency and not self.waiting:
+                self.active += 1
+                return True, False, None
+            if self.waiting >= self.queue:
+                return False, False, 'queue_full'
+            self.waiting += 1
+            deadline = time.monotonic() + timeout
+            try:
+                while self.active >= self.concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False, True, 'queue_timeout'
+                    self.cond.wait(remaining)
+                self.active += 1
+                return True, True, None
+            finally:
+                self.waiting -= 1
+    
+    def leave(self, duration):
+        with self.cond:
+            self.active -= 1
+            self.avg_duration += 0.2 * (duration - self.avg_duration)
+            self.cond.notify()
+    
+    def retry_after(self):
+        """按当前排队长度和平均处理时长估算的重试等待秒数"""
+        with self.cond:
+            return self.avg_duration * (self.waiting + 1) / self.concurrency
+    
+    def snapshot(self):
+        with self.cond:
+            return {'concurrency': self.concurrency, 'queue': self.queue, 'active': self.active,
+                    'waiting': self.waiting, 'avg_duration': round(self.avg_duration, 3)}
+
+
+class AdmissionController:
+    """代理的准入控制：先按IP限流，再按路径限制并发"""
+    
+    def __init__(self, limits=None, queue_timeout=ADMISSION_QUEUE_TIMEOUT, limiter=None):
+        limits = ADMISSION_LIMITS if limits is None else limits
+        # 长前缀优先匹配
+        self.gates = [PathGate(prefix, spec['concurrency'], spec['queue'])
+                      for prefix, spec in sorted(limits.items(), key=lambda item: -len(item[0]))]
+        self.queue_timeout = queue_timeout
+        self.limiter = limiter or TokenBucketLimiter()
+        self.lock = threading.Lock()
+        self.stats = {'admitted': 0, 'queued': 0, 'rejected_rate_limit': 0,
+                      'rejected_queue_full': 0, 'rejected_queue_timeout': 0}
+    
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+    
+    def gate_for(self, path):
+        path = path.split('?', 1)[0]
+        for gate in self.gates:
+            if path.startswith(gate.prefix):
+                return gate
+        return None
+    
+    def acquire(self, client_ip, path):
+        """
+        返回 (gate, rejection)：放行时 rejection 为 None，gate 不为 None 时处理完需调用 release；
+        拒绝时 rejection 为 (状态码, Retry-After 秒数, 原因)
+        """
+        wait = self.limiter.acquire(client_ip)
+        if wait:
+            self._count('rejected_rate_limit')
+            return None, (429, wait, 'rate_limit')
+        
+        gate = self.gate_for(path)
+        if gate is not None:
+            admitted, queued, reason = gate.enter(self.queue_timeout)
+            if queued:
+                self._count('queued')
+            if not admitted:
+                self._count(f'rejected_{reason}')
+                return None, (503, gate.retry_after(), reason)
+        self._count('admitted')
+        return gate, None
+    
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['rate_limit'] = {'rate': self.limiter.rate, 'burst': self.limiter.burst,
+                               'clients': len(self.limiter.buckets)}
+        stats['paths'] = {gate.prefix: gate.snapshot() for gate in self.gates}
+        return stats
+
+
+class BatchDispatcher:
+    """把一批子请求并发转发到后端；每个工作线程复用一条到后端的长连接"""
+    
+    def __init__(self, admission, workers=BATCH_WORKERS, timeout=BATCH_ITEM_TIMEOUT):
+        self.admission = admission
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch')
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.stats = {'batches': 0, 'items': 0, 'backend_errors': 0, 'connections': 0}
+    
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(BACKEND_HOST, BACKEND_PORT, timeout=self.timeout)
+        elif conn.sock is not None and select.select([conn.sock], [], [], 0)[0]:
+            # 空闲长连接上有可读事件：后端已关闭连接（或发来了意外数据），发送前换一条新连接
+            conn.close()
+        if conn.sock is None:
+            with self.lock:
+                self.stats['connections'] += 1
+        return conn
+    
+    def _forward(self, method, path, body):
+        """
+        经长连接发送一个请求，返回 (状态码, Content-Type, 响应体)；
+        复用的连接在发送阶段失败时请求未送达，重连重试一次；请求发出后连接断开时后端可能已处理，只重试幂等的 GET
+        """
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        for attempt in range(2):
+            conn = self._connection()
+            reused = conn.sock is not None
+            retry = reused and not attempt
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+            except (ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if retry:
+                    continue
+                raise
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                raise
+            try:
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError):
+                conn.close()
+                if retry and method == 'GET':
+                    continue
+                raise
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            return response.status, response.getheader('Content-Type', ''), data
+    
+    def _admit_item(self, index, item, client_ip):
+        """校验子请求并做准入控制，返回 (gate, 拒绝时的结果)；可能在路径队列中等待，只在批量请求的处理线程中调用"""
+        item_id = item.get('id', index) if isinstance(item, dict) else index
+        method = str(item.get('method', 'GET')).upper() if isinstance(item, dict) else None
+        path = item.get('path') if isinstance(item, dict) else None
+        if method not in ('GET', 'POST') or not isinstance(path, str) or not path.startswith('/api/') \
+                or path.split('?', 1)[0] == BATCH_PATH:
+            return None, {'id': item_id, 'status': 400, 'error': '无效的子请求：需要 method(GET/POST) 和 /api/ 路径'}
+        
+        # 每个子请求单独经过准入控制（占用令牌和对应路径的并发名额）
+        gate, rejection = self.admission.acquire(client_ip, path)
+        if rejection is not None:
+            status, retry_after, reason = rejection
+            return None, {'id': item_id, 'status': status, 'error': reason,
+                          'retry_after': max(1, math.ceil(retry_after))}
+        return gate, None
+    
+    def _run_item(self, index, item, gate, started):
+        """在工作线程中转发一个已放行的子请求，结束后归还路径名额"""
+        item_id = item.get('id', index)
+        method = str(item.get('method', 'GET')).upper()
+        try:
+            status, content_type, data = self._forward(method, item['path'],
+                                                       item.get('body') if method == 'POST' else None)
+        except (OSError, http.client.HTTPException) as e:
+            with self.lock:
+                self.stats['backend_errors'] += 1
+            return {'id': item_id, 'status': 502, 'error': '后端服务不可用', 'message': str(e)}
+        finally:
+            if gate is not None:
+                gate.leave(time.monotonic() - started)
+        
+        text = data.decode('utf-8', errors='replace')
+        body = text
+        if 'json' in content_type:
+            try:
+                body = json.loads(text)
+            except ValueError:
+                pass
+        return {'id': item_id, 'status': status, 'body': body,
+                'elapsed_ms': round((time.monotonic() - started) * 1000, 1)}
+    
+    def dispatch(self, items, client_ip):
+        """
+        按顺序为子请求做准入（排队等待发生在当前请求线程中），放行后才提交到工作线程并发转发；
+        工作线程只执行已放行的转发，不会因排队被占住。按提交顺序返回各自的结果
+        """
+        with self.lock:
+            self.stats['batches'] += 1
+            self.stats['items'] += len(items)
+        results = [None] * len(items)
+        futures = []
+        for i, item in enumerate(items):
+            started = time.monotonic()
+            gate, rejected = self._admit_item(i, item, client_ip)
+            if rejected is not None:
+                results[i] = rejected
+                continue
+            try:
+                futures.append((i, self.executor.submit(self._run_item, i, item, gate, started)))
+            except RuntimeError:
+                if gate is not None:
+                    gate.leave(time.monotonic() - started)
+                raise
+        for i, future in futures:
+            results[i] = future.result()
+        return results
+    
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+class ProxyHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """多线程代理服务器；升级为WebSocket的连接交给 relay，不由服务器关闭"""
+    daemon_threads = True
+    allow_reuse_address = True
+    # 突发请求时连接先进入监听队列，默认的5会让多余的连接在握手阶段超时重传
+    request_queue_size = 128
+    
+    def __init__(self, server_address, handler_class):
+        super().__init__(server_address, handler_class)
+        self.relay = WebSocketRelay()
+        self.admission = AdmissionController()
+        self.batch = BatchDispatcher(self.admission)
+        self._detached = set()
+        self._detached_lock = threading.Lock()
+    
+    def detach(self, request):
+        with self._detached_lock:
+            self._detached.add(request)
+    
+    def shutdown_request(self, request):
+        with self._detached_lock:
+            if request in self._detached:
+                self._detached.discard(request)
+                return
+        super().shutdown_request(request)
+
 class ProxyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     
+    def admit(self):
+        """准入检查；被拒绝时直接返回 429/503（带 Retry-After），返回 (是否放行, gate)"""
+        gate, rejection = self.server.admission.acquire(self.client_address[0], self.path)
+        if rejection is None:
+            return True, gate
+        
+        status, retry_after, reason = rejection
+        print(f"拒绝请求 ({reason}): {self.client_address[0]} {self.path}")
+        message = '请求频率超限，请稍后再试' if status == 429 else '服务繁忙，请稍后再试'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Retry-After', str(max(1, math.ceil(retry_after))))
+        self.end_headers()
+        self.wfile.write(json.dumps({'success': False, 'error': message, 'reason': reason}).encode())
+        return False, None
+    
     def do_POST(self):
-        """处理POST请求，代理到后端服务"""
+        """处理POST请求，经准入控制后代理到后端服务"""
+        # 先读完请求体，拒绝时客户端也能正常收到响应
+        content_length = int(self.headers.get('Content-Length', 0))
+        post_data = self.rfile.read(content_length)
+        
+        # 批量接口的子请求各自经过准入控制
+        if self.path.split('?', 1)[0] == BATCH_PATH:
+            self.handle_batch(post_data)
+            return
+        
+        admitted, gate = self.admit()
+        if not admitted:
+            return
+        started = time.monotonic()
+        try:
+            self.proxy_post(post_data)
+        finally:
+            if gate is not None:
+                gate.leave(time.monotonic() - started)
+    
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def handle_batch(self, post_data):
+        """
+        批量代理：请求体为 {"requests": [{"id": ..., "method": "GET"|"POST", "path": "/api/...", "body": {...}}]}，
+        子请求并发转发到后端，响应按顺序返回 {"responses": [{"id", "status", "body"}]}
+        """
+        started = time.monotonic()
+        try:
+            payload = json.loads(post_data or b'{}')
+        except ValueError:
+            self.send_json(400, {'success': False, 'error': '请求体不是有效的JSON'})
+            return
+        items = payload.get('requests') if isinstance(payload, dict) else payload
+        if not isinstance(items, list) or not items:
+            self.send_json(400, {'success': False, 'error': '需要非空的 requests 列表'})
+            return
+        if len(items) > BATCH_MAX_ITEMS:
+            self.send_json(400, {'success': False, 'error': f'单批最多 {BATCH_MAX_ITEMS} 个子请求'})
+            return
+        
+        responses = self.server.batch.dispatch(items, self.client_address[0])
+        print(f"批量代理: {len(items)} 个子请求，耗时 {(time.monotonic() - started) * 1000:.1f} ms")
+        self.send_json(200, {'success': True, 'responses': responses,
+                             'elapsed_ms': round((time.monotonic() - started) * 1000, 1)})
+    
+    def proxy_post(self, post_data):
+        """代理POST请求到后端服务"""
         try:
-            # 读取请求体
-            content_length = int(self.headers.get('Content-Length', 0))
-            post_data = self.rfile.read(content_length)
-            
             # 构建后端URL
             backend_url = f"http://localhost:3000{self.path}"
             print(f"代理POST请求: {self.path} -> {backend_url}")
@@ -85,37 +638,96 @@ class ProxyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
     
+    def proxy_websocket(self):
+        """把WebSocket升级请求原样转发到后端，之后由 relay 透传双向字节流"""
+        try:
+            backend = socket.create_connection((BACKEND_HOST, BACKEND_PORT), timeout=10)
+        except OSError as e:
+            print(f"WebSocket后端连接失败: {e}")
+            self.send_response(502)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'success': False, 'error': '后端服务不可用'}).encode())
+            return
+        
+        # 重建原始握手请求（请求行 + 头部），后端的 101 响应经隧道直接返回客户端
+        head = f"{self.requestline}\r\n" + ''.join(f"{k}: {v}\r\n" for k, v in self.headers.items()) + "\r\n"
+        backend.sendall(head.encode('latin-1'))
+        
+        # 取出已读入缓冲区、尚未处理的客户端字节
+        self.wfile.flush()
+        self.connection.setblocking(False)
+        try:
+            initial = self.rfile.peek()
+            self.rfile.read(len(initial))
+        except (BlockingIOError, ValueError):
+            initial = b''
+        
+        print(f"WebSocket隧道: {self.path} -> {BACKEND_HOST}:{BACKEND_PORT}")
+        self.server.detach(self.connection)
+        self.server.relay.add(self.connection, backend, initial)
+        self.close_connection = True
+    
     def do_GET(self):
         """处理GET请求"""
+        # WebSocket升级请求整体转发
+        if self.headers.get('Upgrade', '').lower() == 'websocket':
+            self.proxy_websocket()
+            return
+        
+        # 代理自身的连接统计
+        if self.path == '/__proxy/stats':
+            body = json.dumps({'websocket': self.server.relay.snapshot(),
+                               'admission': self.server.admission.snapshot(),
+                               'batch': self.server.batch.snapshot()}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        
         # API请求代理到后端
         if self.path.startswith('/api/'):
+            admitted, gate = self.admit()
+            if not admitted:
+                return
+            started = time.monotonic()
             try:
-                backend_url = f"http://localhost:3000{self.path}"
-                print(f"代理GET请求: {self.path} -> {backend_url}")
+                self.proxy_get()
+            finally:
+                if gate is not None:
+                    gate.leave(time.monotonic() - started)
+        else:
+            # 静态文件请求
+            super().do_GET()
+    
+    def proxy_get(self):
+        """代理GET请求到后端服务"""
+        try:
+            backend_url = f"http://localhost:3000{self.path}"
+            print(f"代理GET请求: {self.path} -> {backend_url}")
+            
+            with urllib.request.urlopen(backend_url, timeout=10) as response:
+                response_data = response.read()
                 
-                with urllib.request.urlopen(backend_url, timeout=10) as response:
-                    response_data = response.read()
-                    
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(response_data)
-                    
-            except URLError as e:
-                print(f"后端连接失败: {e}")
-                self.send_response(503)
+                self.send_response(200)
                 self.send_header('Content-Type', 'application/json')
                 self.send_header('Access-Control-Allow-Origin', '*')
                 self.end_headers()
-                error_response = {
-                    'success': False,
-                    'error': '后端服务不可用'
-                }
-                self.wfile.write(json.dumps(error_response).encode())
-        else:
-            # 静态文件请求
-            super().do_GET()
+                self.wfile.write(response_data)
+                
+        except URLError as e:
+            print(f"后端连接失败: {e}")
+            self.send_response(503)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            error_response = {
+                'success': False,
+                'error': '后端服务不可用'
+            }
+            self.wfile.write(json.dumps(error_response).encode())
     
     def log_message(self, format, *args):
         """自定义日志格式"""
@@ -125,9 +737,13 @@ def run_server(port=8080):
     """启动服务器"""
     handler = ProxyHTTPRequestHandler
     
-    with socketserver.TCPServer(("", port), handler) as httpd:
+    with ProxyHTTPServer(("", port), handler) as httpd:
         print(f"启动前端代理服务器，端口: {port}")
         print(f"支持POST请求代理到后端服务")
+        print(f"准入控制: 每IP {RATE_LIMIT_RATE:g} 请求/秒（突发 {RATE_LIMIT_BURST}），"
+              f"限流路径: {', '.join(ADMISSION_LIMITS)}")
+        print(f"批量接口: POST {BATCH_PATH}（单批最多 {BATCH_MAX_ITEMS} 个子请求）")
+        print(f"支持WebSocket升级透传（空闲超时 {WS_IDLE_TIMEOUT} 秒），连接统计: /__proxy/stats")
         print(f"访问: http://localhost:{port}")
         try:
             httpd.serve_forever()
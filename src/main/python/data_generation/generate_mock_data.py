@@ -13,6 +13,10 @@ from datetime import datetime, timedelta
 import random
 import math
 
+from rollups import RollupPyramid
+from streaming_stats import RecordStats
+from history_store import HistoryStore
+
 class CCUDataGenerator:
     def __init__(self):
         self.base_time = datetime.now()
@@ -137,28 +141,25 @@ class CCUDataGenerator:
         """生成实时数据"""
         return self.generate_single_record(self.base_time)
 
-    def calculate_statistics(self, data):
-        """计算数据统计信息"""
-        if not data:
+    def calculate_statistics(self, data, accumulator=None):
+        """计算数据统计信息（单遍扫描；传入 accumulator 时在其上继续累加，便于分片合并）"""
+        if not data and accumulator is None:
             return {}
         
-        stats = {}
         numeric_fields = [
             'co2_capture_rate', 'energy_consumption', 'methanol_yield',
             'revenue', 'profit', 'flue_gas_flow_rate'
         ]
         
-        for field in numeric_fields:
-            values = [record[field] for record in data if field in record]
-            if values:
-                stats[field] = {
-                    'min': min(values),
-                    'max': max(values),
-                    'avg': sum(values) / len(values),
-                    'count': len(values)
-                }
-        
-        return stats
+        accumulator = accumulator or RecordStats(numeric_fields)
+        accumulator.extend(data)
+        return accumulator.summary()
+
+    def calculate_rollups(self, data, pyramid=None):
+        """计算（或在已有汇总上增量追加）日/周/月多分辨率汇总"""
+        pyramid = pyramid or RollupPyramid()
+        pyramid.extend(data)
+        return pyramid
 
     def save_data(self, data, output_dir, filename):
         """保存数据到文件"""
@@ -177,6 +178,8 @@ def main():
     parser.add_argument('--output', type=str, default='./data', help='输出目录')
     parser.add_argument('--realtime-only', action='store_true', help='只生成实时数据')
     parser.add_argument('--with-stats', action='store_true', help='生成统计信息')
+    parser.add_argument('--store', type=str, help='同时追加写入分段历史存储目录（不重写整个历史文件）')
+    parser.add_argument('--with-rollups', action='store_true', help='生成日/周/月多分辨率汇总')
     
     args = parser.parse_args()
     
@@ -192,6 +195,9 @@ def main():
             realtime_data = generator.generate_realtime_data()
             generator.save_data(realtime_data, args.output, 'realtime_data.json')
             print(f"实时数据生成完成: {realtime_data['timestamp']}")
+            if args.store:
+                last_seq = HistoryStore(args.store).append([realtime_data])
+                print(f"已追加到历史存储: {args.store} (序号 {last_seq})")
             
         else:
             # 生成历史数据
@@ -204,12 +210,21 @@ def main():
             
             print(f"历史数据生成完成: {len(historical_data)} 条记录")
             print(f"数据时间范围: {historical_data[0]['timestamp']} 至 {historical_data[-1]['timestamp']}")
+            if args.store:
+                last_seq = HistoryStore(args.store).append(historical_data)
+                print(f"已追加到历史存储: {args.store} (序号 {last_seq})")
             
             # 生成统计信息
             if args.with_stats:
                 stats = generator.calculate_statistics(historical_data)
                 generator.save_data(stats, args.output, 'statistics.json')
                 print("统计信息生成完成")
+
+            # 生成多分辨率汇总
+            if args.with_rollups:
+                rollups = generator.calculate_rollups(historical_data)
+                generator.save_data(rollups.to_dict(), args.output, 'rollups.json')
+                print("多分辨率汇总生成完成")
         
         print("=" * 50)
         print("数据生成任务完成")
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+沪碳智脑 - 追加写分段历史存储
+记录按时间分区（默认每段7天）追加写入 JSON Lines 段文件，每条记录带全局递增序号；
+小型清单文件（manifest.json）记录各段的时间范围、序号范围、已提交的字节长度和状态，原子替换更新；
+段文件中超出清单记录的部分（写入段文件后、更新清单前崩溃留下的数据）不可见，下次写入前截断。
+写者之间用文件锁互斥（POSIX 用 fcntl，Windows 用 msvcrt）；只读打开不创建目录、不取锁。
+读者以序号为游标，只读取游标之后有新数据的段（增量读取）；
+已封存的段可压实（compact 命令）：按时间排序、同一时刻的重复记录保留最新一条。
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+STORE_FORMAT = "ccu-history"
+STORE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+SEGMENT_DIR = "segments"
+DEFAULT_SEGMENT_HOURS = 168
+
+# 分区对齐的基准时间
+_EPOCH = datetime(2000, 1, 3)  # 周一
+
+
+def parse_timestamp(value: str) -> datetime:
+    """解析为不带时区的时间，用于分区"""
+    timestamp = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return timestamp.replace(tzinfo=None) if timestamp.tzinfo else timestamp
+
+
+def _lock_file(lock_file):
+    """跨进程独占锁；两种机制都不可用时只依赖进程内的线程锁"""
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+    elif msvcrt is not None:
+        lock_file.seek(0)
+        while True:
+            try:
+                # LK_LOCK 重试约10秒后抛出 OSError，持续等待直到拿到锁
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+
+def _unlock_file(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _latest_per_timestamp(entries: List[Tuple]) -> List[Dict]:
+    """按 (时间, 序号) 排序，同一时刻只保留序号最大的记录"""
+    entries.sort(key=lambda e: (e[0], e[1]))
+    records = []
+    for i, (timestamp, _, record) in enumerate(entries):
+        if i + 1 < len(entries) and entries[i + 1][0] == timestamp:
+            continue
+        records.append(record)
+    return records
+
+
+class HistoryStore:
+    """按时间分段的追加写历史存储"""
+
+    def __init__(self, root: str, segment_hours: int = DEFAULT_SEGMENT_HOURS, readonly: bool = False):
+        """readonly 时只读打开：存储必须已存在，不创建目录、不清理未提交数据（读取本就只看已提交部分）"""
+        self.root = root
+        self.readonly = readonly
+        self.segment_dir = os.path.join(root, SEGMENT_DIR)
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+        if readonly:
+            if not os.path.exists(self.manifest_path):
+                raise FileNotFoundError(f"历史存储不存在: {root}")
+        else:
+            os.makedirs(self.segment_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.manifest = self._load_manifest(segment_hours)
+        if self.manifest["segments"] and not readonly:
+            # 打开时清理上次崩溃留下的未提交数据
+            with self._writer():
+                pass
+
+    # ---------- 清单 ----------
+
+    def _load_manifest(self, segment_hours: int) -> Dict:
+        if not os.path.exists(self.manifest_path):
+            return {"format": STORE_FORMAT, "version": STORE_VERSION, "segment_hours": segment_hours,
+                    "next_seq": 1, "segments": {}}
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("format") != STORE_FORMAT or manifest.get("version") != STORE_VERSION:
+            raise ValueError(f"不支持的历史存储: {manifest.get('format')} v{manifest.get('version')}")
+        return manifest
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def refresh(self):
+        """重新加载清单（读者进程在读取前调用，以看到其他进程的追加）"""
+        self.manifest = self._load_manifest(self.manifest["segment_hours"])
+
+    def _recover(self):
+        """把每个段文件截断到清单记录的已提交长度，丢弃崩溃留下的孤立行和不完整行"""
+        changed = False
+        for segment in self.manifest["segments"].values():
+            committed = segment["bytes"]
+            path = self._segment_path(segment)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size > committed:
+                with open(path, 'r+b') as f:
+                    f.truncate(committed)
+                    f.flush()
+                    os.fsync(f.fileno())
+            elif size < committed:
+                # 压实后替换了段文件、但清单未更新时崩溃
+                segment["bytes"] = size
+                changed = True
+        if changed:
+            self._save_manifest()
+
+    @contextmanager
+    def _writer(self):
+        """写者互斥：进程内线程锁 + 跨进程文件锁，持锁期间以磁盘上的最新清单为准，并先清理未提交数据"""
+        if self.readonly:
+            raise PermissionError(f"历史存储以只读方式打开: {self.root}")
+        with self._lock:
+            with open(os.path.join(self.root, ".lock"), 'a+') as lock_file:
+                _lock_file(lock_file)
+                try:
+                    self.refresh()
+                    self._recover()
+                    yield
+                finally:
+                    _unlock_file(lock_file)
+
+    # ---------- 分区 ----------
+
+    def partition_start(self, timestamp: datetime) -> datetime:
+        hours = self.manifest["segment_hours"]
+        offset = (timestamp - _EPOCH) // timedelta(hours=hours)
+        return _EPOCH + timedelta(hours=hours * offset)
+
+    def segments(self) -> List[Dict]:
+        """按分区时间排序的段信息"""
+        return [self.manifest["segments"][k] for k in sorted(self.manifest["segments"])]
+
+    def _segment_path(self, segment: Dict) -> str:
+        return os.path.join(self.segment_dir, segment["name"])
+
+    # ---------- 写入 ----------
+
+    def append(self, records: Iterable[Dict]) -> int:
+        """追加记录，返回最后一条记录的序号；只追加段文件末尾并更新一次清单"""
+        with self._writer():
+            by_segment: Dict[str, List[str]] = {}
+            created = set()
+            segments = self.manifest["segments"]
+            seq = self.manifest["next_seq"]
+            for record in records:
+                try:
+                    timestamp = parse_timestamp(record['timestamp'])
+                except (KeyError, ValueError, AttributeError):
+                    continue
+                start = self.partition_start(timestamp)
+                key = start.isoformat()
+                segment = segments.get(key)
+                if segment is None:
+                    created.add(key)
+                    end = start + timedelta(hours=self.manifest["segment_hours"])
+                    segment = segments[key] = {
+                        "name": f"seg-{start.strftime('%Y%m%dT%H')}.jsonl", "start": key, "end": end.isoformat(),
+                        "first_seq": seq, "last_seq": seq, "count": 0, "bytes": 0, "compacted": False
+                    }
+                segment["last_seq"] = seq
+                segment["count"] += 1
+                # 写入过的已压实段需重新压实
+                segment["compacted"] = False
+                by_segment.setdefault(key, []).append(
+                    json.dumps({"seq": seq, "record": record}, ensure_ascii=False, separators=(',', ':')))
+                seq += 1
+
+            # 先写段文件，再更新清单（提交点）；清单更新前崩溃时，追加的数据会在下次写入前被截断
+            for key, lines in by_segment.items():
+                data = ("\n".join(lines) + "\n").encode('utf-8')
+                # 新段覆盖写：清单中不存在的同名文件只可能是崩溃遗留
+                with open(self._segment_path(segments[key]), 'wb' if key in created else 'ab') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                segments[key]["bytes"] += len(data)
+            self.manifest["next_seq"] = seq
+            self._save_manifest()
+            return seq - 1
+
+    # ---------- 读取 ----------
+
+    def _iter_segment(self, segment: Dict) -> Iterator[Tuple[int, Dict]]:
+        """只读取清单中已提交的部分（正在写入或崩溃遗留的数据不可见）"""
+        path = self._segment_path(segment)
+        if not os.path.exists(path):
+            return
+        remaining = segment["bytes"]
+        with open(path, 'rb') as f:
+            for line in f:
+                remaining -= len(line)
+                if remaining < 0 or not line.endswith(b"\n"):
+                    break
+                entry = json.loads(line)
+                if entry["seq"] > segment["last_seq"]:
+                    break
+                yield entry["seq"], entry["record"]
+
+    def read_since(self, cursor: Optional[int] = None) -> Tuple[List[Dict], int]:
+        """读取序号大于 cursor 的记录（按时间排序，同一时刻取最新），返回 (记录, 新游标)；cursor 为None时读取全部"""
+        self.refresh()
+        cursor = cursor or 0
+        entries = []
+        for segment in self.segments():
+            if segment["last_seq"] <= cursor:
+                continue
+            entries.extend((record.get('timestamp', ''), seq, record)
+                           for seq, record in self._iter_segment(segment) if seq > cursor)
+        new_cursor = max([cursor] + [seq for _, seq, _ in entries])
+        return _latest_per_timestamp(entries), new_cursor
+
+    def read_range(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """读取 [start, end) 时间区间内的记录，只打开与区间重叠的段"""
+        self.refresh()
+        start_ts = parse_timestamp(start) if start else None
+        end_ts = parse_timestamp(end) if end else None
+        entries = []
+        for segment in self.segments():
+            if end_ts and datetime.fromisoformat(segment["start"]) >= end_ts:
+                continue
+            if start_ts and datetime.fromisoformat(segment["end"]) <= start_ts:
+                continue
+            for seq, record in self._iter_segment(segment):
+                timestamp = parse_timestamp(record['timestamp'])
+                if (start_ts is None or timestamp >= start_ts) and (end_ts is None or timestamp < end_ts):
+                    entries.append((timestamp, seq, record))
+        return _latest_per_timestamp(entries)
+
+    def tail(self, n: int) -> List[Dict]:
+        """最近 n 条记录，从最新的段向前读取"""
+        collected: List[Tuple[str, int, Dict]] = []
+        self.refresh()
+        for segment in reversed(self.segments()):
+            collected.extend((record.get('timestamp', ''), seq, record)
+                             for seq, record in self._iter_segment(segment))
+            if len(collected) >= n:
+                break
+        return _latest_per_timestamp(collected)[-n:]
+
+    # ---------- 压实 ----------
+
+    def compact(self, now: Optional[datetime] = None) -> int:
+        """压实已封存（分区已结束）且未压实的段，返回压实的段数"""
+        now = now or datetime.now()
+        compacted = 0
+        with self._writer():
+            for segment in self.segments():
+                if segment["compacted"] or datetime.fromisoformat(segment["end"]) > now:
+                    continue
+                latest: Dict[str, Tuple[int, Dict]] = {}
+                for seq, record in self._iter_segment(segment):
+                    key = record.get('timestamp', '')
+                    if key not in latest or seq > latest[key][0]:
+                        latest[key] = (seq, record)
+
+                path = self._segment_path(segment)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    for key in sorted(latest):
+                        seq, record = latest[key]
+                        f.write((json.dumps({"seq": seq, "record": record}, ensure_ascii=False,
+                                            separators=(',', ':')) + "\n").encode('utf-8'))
+                    f.flush()
+                    os.fsync(f.fileno())
+                    size = f.tell()
+                os.replace(tmp_path, path)
+                segment["count"] = len(latest)
+                segment["bytes"] = size
+                segment["compacted"] = True
+                compacted += 1
+            if compacted:
+                self._save_manifest()
+        return compacted
+
+    def stats(self) -> Dict:
+        segments = self.segments()
+        return {
+            "segments": len(segments),
+            "records": sum(s["count"] for s in segments),
+            "last_seq": self.manifest["next_seq"] - 1,
+            "compacted": sum(1 for s in segments if s["compacted"]),
+            "range": [segments[0]["start"], segments[-1]["end"]] if segments else None
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CCU追加写历史存储')
+    parser.add_argument('command', choices=['import', 'compact', 'stats', 'export'],
+                        help='import: 追加导入JSON记录文件；compact: 压实已封存段；stats: 统计；export: 导出为JSON数组')
+    parser.add_argument('--store', type=str, required=True, help='存储目录')
+    parser.add_argument('--input', type=str, help='import 的输入文件（JSON数组或单条记录）')
+    parser.add_argument('--output', type=str, help='export 的输出文件')
+    parser.add_argument('--segment-hours', type=int, default=DEFAULT_SEGMENT_HOURS, help='新存储的分段时长（小时）')
+
+    args = parser.parse_args()
+
+    try:
+        store = HistoryStore(args.store, args.segment_hours, readonly=args.command in ('stats', 'export'))
+        if args.command == 'import':
+            with open(args.input, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            last_seq = store.append(records if isinstance(records, list) else [records])
+            print(f"导入完成，最新序号: {last_seq}")
+        elif args.command == 'compact':
+            print(f"压实完成: {store.compact()} 个段")
+        elif args.command == 'export':
+            records, cursor = store.read_since(None)
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(records, f, ensure_ascii=False, indent=2)
+            print(f"导出 {len(records)} 条记录（游标 {cursor}）到: {args.output}")
+        print(json.dumps(store.stats(), ensure_ascii=False, indent=2))
+
+    except Exception as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+沪碳智脑 - 多分辨率汇总金字塔
+为每个数值字段预计算 日/周/月 的 min/max/mean/count 汇总，逐条追加小时记录时增量更新；
+任意时间跨度按目标点数选择合适的分辨率，二分定位桶区间后直接返回；
+较短的跨度直接取原始小时数据，点数超过目标时用 LTTB 保形降采样（汇总点数超过目标时同样降采样）。
+"""
+
+import argparse
+import json
+import sys
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# 由细到粗
+RESOLUTIONS = ["day", "week", "month"]
+
+# 有原始小时数据且跨度不超过该天数时，对小时数据做LTTB降采样，而不是返回日汇总
+RAW_SPAN_DAYS = 90
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    """时间戳所在汇总桶的起始时间"""
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        return day
+    if resolution == "week":
+        return day - timedelta(days=day.weekday())
+    if resolution == "month":
+        return day.replace(day=1)
+    raise ValueError(f"不支持的分辨率: {resolution}")
+
+
+class RollupPyramid:
+    """日/周/月汇总，每个桶保存各字段的 [min, max, sum, count]"""
+
+    def __init__(self, fields: Optional[Sequence[str]] = None):
+        # fields 为None时按首条记录中的数值字段确定
+        self.fields = list(fields) if fields else None
+        self.buckets: Dict[str, Dict[datetime, Dict[str, List[float]]]] = {r: {} for r in RESOLUTIONS}
+        self.keys: Dict[str, List[datetime]] = {r: [] for r in RESOLUTIONS}
+
+    def append(self, record: Dict):
+        """增量追加一条小时记录"""
+        try:
+            timestamp = datetime.fromisoformat(record['timestamp'].replace('Z', '+00:00'))
+        except (KeyError, ValueError, AttributeError):
+            return
+        if self.fields is None:
+            self.fields = [k for k, v in record.items()
+                           if k != 'timestamp' and isinstance(v, (int, float)) and not isinstance(v, bool)]
+
+        for resolution in RESOLUTIONS:
+            start = bucket_start(timestamp, resolution)
+            bucket = self.buckets[resolution].get(start)
+            if bucket is None:
+                bucket = self.buckets[resolution][start] = {}
+                keys = self.keys[resolution]
+                if not keys or start > keys[-1]:
+                    keys.append(start)
+                else:
+                    insort(keys, start)
+            for field in self.fields:
+                value = record.get(field)
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    continue
+                stats = bucket.get(field)
+                if stats is None:
+                    bucket[field] = [value, value, value, 1]
+                else:
+                    if value < stats[0]:
+                        stats[0] = value
+                    if value > stats[1]:
+                        stats[1] = value
+                    stats[2] += value
+                    stats[3] += 1
+
+    def extend(self, records: Iterable[Dict]):
+        for record in records:
+            self.append(record)
+
+    def choose_resolution(self, start: datetime, end: datetime, max_points: int) -> str:
+        """桶数不超过 max_points 的最细分辨率"""
+        span_days = max((end - start).total_seconds() / 86400, 0)
+        for resolution, days in zip(RESOLUTIONS, (1, 7, 30.44)):
+            if span_days / days <= max_points:
+                return resolution
+        return RESOLUTIONS[-1]
+
+    def query(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              max_points: int = 500, resolution: Optional[str] = None,
+              fields: Optional[Sequence[str]] = None) -> Dict:
+        """查询 [start, end) 的汇总序列，未指定分辨率时按 max_points 自动选择"""
+        keys_all = self.keys["day"]
+        if not keys_all:
+            return {"resolution": resolution or "day", "points": [], "downsampled": False}
+        start = start or keys_all[0]
+        end = end or keys_all[-1] + timedelta(days=1)
+        resolution = resolution or self.choose_resolution(start, end, max_points)
+
+        keys = self.keys[resolution]
+        lo = bisect_left(keys, bucket_start(start, resolution))
+        hi = bisect_left(keys, end)
+        fields = fields or self.fields or []
+        points = []
+        for key in keys[lo:hi]:
+            bucket = self.buckets[resolution][key]
+            point = {"timestamp": key.isoformat()}
+            for field in fields:
+                stats = bucket.get(field)
+                if stats:
+                    point[field] = {"min": stats[0], "max": stats[1],
+                                    "mean": round(stats[2] / stats[3], 4), "count": stats[3]}
+            points.append(point)
+        # 指定的分辨率（或最粗的月汇总）仍超过目标点数时，按各字段均值降采样
+        sampled = downsample_points(points, fields, max_points,
+                                    lambda point, field: (point.get(field) or {}).get("mean"))
+        return {"resolution": resolution, "points": sampled, "downsampled": len(sampled) < len(points)}
+
+    def to_dict(self) -> Dict:
+        return {
+            "fields": self.fields,
+            "rollups": {
+                resolution: [{"timestamp": key.isoformat(), **self.buckets[resolution][key]}
+                             for key in self.keys[resolution]]
+                for resolution in RESOLUTIONS
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict) -> "RollupPyramid":
+        pyramid = cls(payload["fields"])
+        for resolution in RESOLUTIONS:
+            for entry in payload["rollups"].get(resolution, []):
+                entry = dict(entry)
+                key = datetime.fromisoformat(entry.pop("timestamp"))
+                pyramid.buckets[resolution][key] = entry
+                pyramid.keys[resolution].append(key)
+        return pyramid
+
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """Largest-Triangle-Three-Buckets 保形降采样，返回选中点的下标（保留首尾点）"""
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    selected = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # 下一个桶的平均点
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        count = max(next_end - next_start, 1)
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        # 当前桶中与上一个选中点、下一桶均值构成最大三角形的点
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = xs[a], ys[a]
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        selected.append(best)
+        a = best
+
+    selected.append(n - 1)
+    return selected
+
+
+def downsample_points(points: List[Dict], fields: Sequence[str], max_points: int, value=None) -> List[Dict]:
+    """
+    对按时间排序的点做LTTB降采样：每个字段分到 max_points / 字段数 的点数各自选点，
+    取并集后按时间返回，结果不超过 max_points；value(point, field) 取字段的数值（默认直接取值）
+    """
+    if len(points) <= max_points or not fields:
+        return points
+    value = value or (lambda point, field: point.get(field))
+    xs = [datetime.fromisoformat(p['timestamp'].replace('Z', '+00:00')).timestamp() for p in points]
+    per_field = max(3, max_points // len(fields))
+    selected = set()
+    for field in fields:
+        rows = [i for i, p in enumerate(points) if isinstance(value(p, field), (int, float))]
+        if not rows:
+            continue
+        picked = lttb_indices([xs[i] for i in rows], [value(points[i], field) for i in rows], per_field)
+        selected.update(rows[i] for i in picked)
+    return [points[i] for i in sorted(selected)]
+
+
+def query_records(records: Sequence[Dict], start: Optional[datetime] = None, end: Optional[datetime] = None,
+                  max_points: int = 500, fields: Optional[Sequence[str]] = None) -> Dict:
+    """原始小时记录（按时间排序）中 [start, end) 的数据，点数超过 max_points 时LTTB降采样"""
+    timestamps = [r.get('timestamp', '') for r in records]
+    lo = bisect_left(timestamps, start.isoformat()) if start else 0
+    hi = bisect_left(timestamps, end.isoformat()) if end else len(records)
+    if fields is None:
+        fields = [k for k, v in (records[lo] if lo < hi else {}).items()
+                  if k != 'timestamp' and isinstance(v, (int, float)) and not isinstance(v, bool)]
+    points = [{"timestamp": r['timestamp'], **{f: r[f] for f in fields if f in r}} for r in records[lo:hi]]
+    sampled = downsample_points(points, fields, max_points)
+    return {"resolution": "hour", "points": sampled, "downsampled": len(sampled) < len(points)}
+
+
+def query_span(pyramid: RollupPyramid, records: Optional[Sequence[Dict]] = None, start: Optional[datetime] = None,
+               end: Optional[datetime] = None, max_points: int = 500, resolution: Optional[str] = None,
+               fields: Optional[Sequence[str]] = None) -> Dict:
+    """
+    图表查询入口：有原始小时数据且跨度不超过 RAW_SPAN_DAYS（或指定 hour 分辨率）时对小时数据降采样，
+    保留日内形状；更长的跨度从汇总金字塔中选择分辨率
+    """
+    if records and resolution in (None, "hour"):
+        first = datetime.fromisoformat(records[0]['timestamp'].replace('Z', '+00:00'))
+        last = datetime.fromisoformat(records[-1]['timestamp'].replace('Z', '+00:00'))
+        span = (min(end, last) if end else last) - (max(start, first) if start else first)
+        if resolution == "hour" or span <= timedelta(days=RAW_SPAN_DAYS):
+            return query_records(records, start, end, max_points, fields)
+    return pyramid.query(start, end, max_points, None if resolution == "hour" else resolution, fields)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CCU多分辨率汇总查询')
+    parser.add_argument('--rollups', type=str, help='汇总文件路径（rollups.json）')
+    parser.add_argument('--data', type=str,
+                        help='历史数据文件路径：现场构建汇总，较短跨度直接对小时数据降采样')
+    parser.add_argument('--output', type=str, help='输出文件路径，默认打印到标准输出')
+    parser.add_argument('--start', type=str, help='起始时间（含），ISO格式')
+    parser.add_argument('--end', type=str, help='结束时间（不含），ISO格式')
+    parser.add_argument('--max-points', type=int, default=500, help='返回点数上限，决定分辨率')
+    parser.add_argument('--resolution', choices=["hour"] + RESOLUTIONS, help='指定分辨率（hour 需要 --data）')
+    parser.add_argument('--fields', type=str, help='字段列表，逗号分隔')
+
+    args = parser.parse_args()
+
+    try:
+        records = None
+        if args.data:
+            with open(args.data, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        if args.rollups:
+            with open(args.rollups, 'r', encoding='utf-8') as f:
+                pyramid = RollupPyramid.from_dict(json.load(f))
+        elif records is not None:
+            pyramid = RollupPyramid()
+            pyramid.extend(records)
+        else:
+            parser.error('需要 --rollups 或 --data')
+        if args.resolution == 'hour' and records is None:
+            parser.error('hour 分辨率需要 --data')
+
+        start = datetime.fromisoformat(args.start) if args.start else None
+        end = datetime.fromisoformat(args.end) if args.end else None
+        fields = args.fields.split(',') if args.fields else None
+        result = query_span(pyramid, records, start, end, args.max_points, args.resolution, fields)
+
+        text = json.dumps(result, ensure_ascii=False, indent=2)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(text)
+            print(f"汇总查询完成: {result['resolution']} 分辨率 {len(result['points'])} 个点"
+                  f"{'（LTTB降采样）' if result['downsampled'] else ''}")
+        else:
+            print(text)
+
+    except Exception as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+沪碳智脑 - 单遍可合并的流式统计
+每个字段一个累加器：计数、均值/方差（Welford，合并用 Chan 公式）、最小/最大值，
+以及相对误差有界的对数分桶分位数草图（DDSketch 思路，支持负值）。
+不同机组或时间段的累加器可直接合并，无需重新扫描原始数据。
+"""
+
+import math
+from typing import Dict, Iterable, Optional, Sequence
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class QuantileSketch:
+    """对数分桶分位数草图，返回值的相对误差不超过 relative_accuracy"""
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        # 正值与负值（按绝对值）分别分桶
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        # 桶 (gamma^(k-1), gamma^k] 的代表值，相对误差不超过 relative_accuracy
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float):
+        if value > 1e-12:
+            key = self._key(value)
+            self.positive[key] = self.positive.get(key, 0) + 1
+        elif value < -1e-12:
+            key = self._key(-value)
+            self.negative[key] = self.negative.get(key, 0) + 1
+        else:
+            self.zero_count += 1
+        self.count += 1
+
+    def merge(self, other: "QuantileSketch"):
+        if other.gamma != self.gamma:
+            raise ValueError("分位数草图的精度参数不一致，无法合并")
+        for key, n in other.positive.items():
+            self.positive[key] = self.positive.get(key, 0) + n
+        for key, n in other.negative.items():
+            self.negative[key] = self.negative.get(key, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        # 负值按绝对值由大到小，即数值由小到大
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    def to_dict(self) -> Dict:
+        return {"relative_accuracy": self.relative_accuracy,
+                "positive": {str(k): n for k, n in self.positive.items()},
+                "negative": {str(k): n for k, n in self.negative.items()},
+                "zero_count": self.zero_count}
+
+    @classmethod
+    def from_dict(cls, payload: Dict) -> "QuantileSketch":
+        sketch = cls(payload["relative_accuracy"])
+        sketch.positive = {int(k): n for k, n in payload["positive"].items()}
+        sketch.negative = {int(k): n for k, n in payload["negative"].items()}
+        sketch.zero_count = payload["zero_count"]
+        sketch.count = sketch.zero_count + sum(sketch.positive.values()) + sum(sketch.negative.values())
+        return sketch
+
+
+class StreamingStats:
+    """单个字段的流式统计累加器"""
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.sketch.add(value)
+
+    def merge(self, other: "StreamingStats"):
+        """Chan 并行合并公式"""
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+        else:
+            total = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / total
+            self.m2 += other.m2 + delta * delta * self.count * other.count / total
+            self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        """草图分位数，限制在实际观测到的 [min, max] 内（分桶代表值可能略超出观测范围）"""
+        value = self.sketch.quantile(q)
+        if value is None:
+            return None
+        return min(max(value, self.min), self.max)
+
+    def summary(self, quantiles: Sequence[float] = DEFAULT_QUANTILES) -> Dict:
+        """汇总结果，保留原有的 min/max/avg/count 字段"""
+        result = {
+            'min': self.min,
+            'max': self.max,
+            'avg': self.mean,
+            'count': self.count,
+            'std': math.sqrt(self.variance)
+        }
+        for q in quantiles:
+            result[f'p{round(q * 100)}'] = self.quantile(q)
+        return result
+
+    def to_dict(self) -> Dict:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max,
+                "sketch": self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, payload: Dict) -> "StreamingStats":
+        stats = cls()
+        stats.count = payload["count"]
+        stats.mean = payload["mean"]
+        stats.m2 = payload["m2"]
+        stats.min = payload["min"]
+        stats.max = payload["max"]
+        stats.sketch = QuantileSketch.from_dict(payload["sketch"])
+        return stats
+
+
+class RecordStats:
+    """多字段累加器：一遍扫描记录，同时更新所有字段"""
+
+    def __init__(self, fields: Sequence[str], relative_accuracy: float = 0.01):
+        self.fields = list(fields)
+        self.stats = {field: StreamingStats(relative_accuracy) for field in self.fields}
+
+    def add(self, record: Dict):
+        for field, stats in self.stats.items():
+            value = record.get(field)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                stats.add(value)
+
+    def extend(self, records: Iterable[Dict]) -> "RecordStats":
+        for record in records:
+            self.add(record)
+        return self
+
+    def merge(self, other: "RecordStats") -> "RecordStats":
+        for field, stats in other.stats.items():
+            if field not in self.stats:
+                self.fields.append(field)
+                self.stats[field] = StreamingStats(stats.sketch.relative_accuracy)
+            self.stats[field].merge(stats)
+        return self
+
+    def summary(self, quantiles: Sequence[float] = DEFAULT_QUANTILES) -> Dict:
+        return {field: stats.summary(quantiles) for field, stats in self.stats.items() if stats.count}
+
+    def to_dict(self) -> Dict:
+        return {field: stats.to_dict() for field, stats in self.stats.items()}
+
+    @classmethod
+    def from_dict(cls, payload: Dict) -> "RecordStats":
+        instance = cls([])
+        for field, stats in payload.items():
+            instance.fields.append(field)
+            instance.stats[field] = StreamingStats.from_dict(stats)
+        return instance
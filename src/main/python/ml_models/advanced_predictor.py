@@ -7,6 +7,7 @@
 """
 
 import json
+import os
 import sys
 import argparse
 import warnings
@@ -14,6 +15,31 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Tuple, Optional
 import math
 
+from streaming_filter import SUPPORTED_FILTERS, create_filter, filter_series
+from hyperparameter_tuning import DEFAULT_PARAMS, load_config, save_config, tune_series
+from forecast_models import MODEL_REGISTRY, SeriesCache, create_model
+from compact_output import OUTPUT_FORMATS, write_binary, write_json
+from time_index import iter_range, load_range, parse_epoch
+from ingestion import AGGREGATIONS, FILL_METHODS, load_hourly
+from model_state import WARM_START_MODELS, MetricState, load_artifact, records_after, save_artifact
+
+# 分段历史存储与数据生成器共用
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_generation'))
+from history_store import HistoryStore  # noqa: E402
+
+try:
+    import gbdt  # noqa: F401  注册 gbdt 模型
+    from feature_store import get_feature_store
+    from var_model import forecast_joint
+except ImportError:  # numpy 未安装时 lgbm 退回指数平滑，var 退回逐指标集成，不使用特征库
+    get_feature_store = None
+    forecast_joint = None
+
+try:
+    from prediction_intervals import RESIDUAL_HISTORY, backtest_residuals, bootstrap_intervals, fit_residual_model
+except ImportError:  # numpy 未安装时不提供预测区间
+    bootstrap_intervals = None
+
 # 使用标准库实现基础功能，避免依赖问题
 warnings.filterwarnings('ignore')
 
@@ -21,11 +47,33 @@ class AdvancedCCUPredictor:
     def __init__(self):
         self.model_name = "Advanced CCU Predictor"
         self.version = "2.0.0"
-        self.supported_models = ["arima", "lgbm", "ensemble"]
-        
-    def load_data(self, data_path: str) -> List[Dict]:
-        """加载历史数据"""
+        self.supported_models = ["arima", "lgbm", "ensemble", "var"]
+        # 按指标调优后的集成参数，未调优的指标使用 DEFAULT_PARAMS
+        self.ensemble_params = {}
+        # 对外模型名称到注册表模型的映射
+        self.model_aliases = {
+            "arima": "linear",
+            "linear": "linear",
+            # 纯NumPy直方图GBDT，numpy不可用时使用指数平滑
+            "lgbm": "gbdt" if "gbdt" in MODEL_REGISTRY else "recursive_exponential",
+            "exponential": "recursive_exponential",
+            "ensemble": "ensemble",
+            # VAR 在 multi_metric_prediction 中对所有指标联合求解，单指标时按集成模型预测
+            "var": "ensemble"
+        }
+        # 输出格式：verbose 每步一条记录（默认）；compact/binary 为结构数组
+        self.output_format = "verbose"
+        # 预处理后的序列缓存（仅对当前数据集有效）
+        self._prepared_data = None
+        self._prepared_series = {}
+        
+    def load_data(self, data_path: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """加载历史数据；指定 start/end 时通过时间索引只读取 [start, end) 区间"""
         try:
+            if start or end:
+                data = load_range(data_path, start, end)
+                print(f"成功加载 {len(data)} 条历史记录 (时间区间 {start or '开始'} 至 {end or '最新'})")
+                return data
             with open(data_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
             print(f"成功加载 {len(data)} 条历史记录")
@@ -33,12 +81,53 @@ class AdvancedCCUPredictor:
         except FileNotFoundError:
             print(f"错误: 数据文件不存在 {data_path}")
             return []
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, ValueError):
             print(f"错误: 数据文件格式错误 {data_path}")
             return []
     
+    def load_samples(self, data_path: str, aggregation: str = "mean", fill: str = "ffill",
+                     max_gap: Optional[int] = None, start: Optional[str] = None,
+                     end: Optional[str] = None) -> List[Dict]:
+        """加载高频采样文件，流式重采样为小时记录；start/end 在重采样之后按 [start, end) 过滤"""
+        try:
+            data = load_hourly(data_path, aggregation, fill, max_gap)
+        except FileNotFoundError:
+            print(f"错误: 数据文件不存在 {data_path}")
+            return []
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"错误: 采样文件格式错误 {data_path}: {e}")
+            return []
+        if start or end:
+            start_epoch = parse_epoch(start) if start else None
+            end_epoch = parse_epoch(end) if end else None
+            data = [r for r in data
+                    if (start_epoch is None or parse_epoch(r['timestamp']) >= start_epoch)
+                    and (end_epoch is None or parse_epoch(r['timestamp']) < end_epoch)]
+        print(f"成功加载 {len(data)} 条小时记录")
+        return data
+    
+    def load_store(self, store_dir: str, cursor: Optional[int] = None, start: Optional[str] = None,
+                   end: Optional[str] = None) -> Tuple[List[Dict], Optional[int]]:
+        """从分段历史存储读取：给定游标时只读取其后的增量记录，返回 (记录, 新游标)"""
+        store = HistoryStore(store_dir, readonly=True)
+        if start or end:
+            data = store.read_range(start, end)
+            print(f"成功加载 {len(data)} 条历史记录 (时间区间 {start or '开始'} 至 {end or '最新'})")
+            return data, None
+        data, new_cursor = store.read_since(cursor)
+        if cursor:
+            print(f"增量加载 {len(data)} 条新记录 (序号 {cursor} -> {new_cursor})")
+        else:
+            print(f"成功加载 {len(data)} 条历史记录")
+        return data, new_cursor
+    
     def extract_time_series(self, data: List[Dict], field: str) -> Tuple[List[datetime], List[float]]:
         """提取时间序列数据"""
+        if get_feature_store is not None:
+            # 特征库一次扫描提取所有指标，按数据集版本缓存
+            timestamps, values = get_feature_store(data).series(field)
+            return timestamps, values.tolist()
+        
         timestamps = []
         values = []
         
@@ -55,133 +144,15 @@ class AdvancedCCUPredictor:
     
     def advanced_moving_average(self, values: List[float], window_sizes: List[int] = [12, 24, 48]) -> Tuple[float, float]:
         """多窗口移动平均预测"""
-        if not values:
-            return 0.0, 0.6
-            
-        predictions = []
-        weights = []
-        
-        for window in window_sizes:
-            if len(values) >= window:
-                recent_values = values[-window:]
-                prediction = sum(recent_values) / len(recent_values)
-                # 权重与窗口大小成反比，短期趋势权重更大
-                weight = 1.0 / window
-                predictions.append(prediction)
-                weights.append(weight)
-        
-        if not predictions:
-            return values[-1] if values else 0.0, 0.7
-            
-        # 加权平均
-        total_weight = sum(weights)
-        weighted_prediction = sum(p * w for p, w in zip(predictions, weights)) / total_weight
-        
-        # 计算置信度
-        variance = sum((p - weighted_prediction) ** 2 for p in predictions) / len(predictions)
-        confidence = max(0.6, 1.0 - variance / (weighted_prediction ** 2) if weighted_prediction != 0 else 0.8)
-        
-        return weighted_prediction, min(0.98, confidence)
+        return create_model("moving_average", SeriesCache(values), window_sizes=window_sizes).one_step()
     
     def exponential_smoothing(self, values: List[float], alpha: float = 0.3) -> Tuple[float, float]:
         """指数平滑预测"""
-        if not values:
-            return 0.0, 0.6
-            
-        if len(values) == 1:
-            return values[0], 0.7
-            
-        # 初始化
-        smoothed = values[0]
-        
-        # 指数平滑
-        for value in values[1:]:
-            smoothed = alpha * value + (1 - alpha) * smoothed
-            
-        # 估计趋势
-        trend = 0.0
-        if len(values) >= 3:
-            recent_trend = (values[-1] - values[-3]) / 2
-            trend = alpha * recent_trend
-            
-        prediction = smoothed + trend
-        
-        # 计算置信度
-        errors = [abs(values[i] - smoothed) for i in range(1, len(values))]
-        mean_error = sum(errors) / len(errors) if errors else 0
-        confidence = max(0.65, 1.0 - mean_error / abs(prediction) if prediction != 0 else 0.8)
-        
-        return prediction, min(0.95, confidence)
+        return create_model("exponential", SeriesCache(values), alpha=alpha).one_step()
     
     def linear_regression_prediction(self, values: List[float], steps: int = 1) -> Tuple[List[float], List[float]]:
         """改进的线性回归预测"""
-        if len(values) < 2:
-            base_value = values[0] if values else 87.5
-            return [base_value] * steps, [0.7] * steps
-        
-        # 使用更长的历史窗口，但对近期数据赋予更高权重
-        max_window = min(72, len(values))  # 最多3天数据
-        recent_values = values[-max_window:]
-        
-        # 创建加权数据点
-        x = []
-        y = []
-        weights = []
-        
-        for i, value in enumerate(recent_values):
-            # 距离现在越近，权重越大
-            weight = (i + 1) / len(recent_values)
-            x.append(i)
-            y.append(value)
-            weights.append(weight)
-        
-        # 加权最小二乘法
-        n = len(x)
-        sum_w = sum(weights)
-        sum_wx = sum(w * xi for w, xi in zip(weights, x))
-        sum_wy = sum(w * yi for w, yi in zip(weights, y))
-        sum_wxy = sum(w * xi * yi for w, xi, yi in zip(weights, x, y))
-        sum_wx2 = sum(w * xi * xi for w, xi in zip(weights, x))
-        
-        # 计算斜率和截距
-        denominator = sum_w * sum_wx2 - sum_wx * sum_wx
-        if abs(denominator) < 1e-10:
-            # 避免除零错误，使用简单平均
-            slope = 0
-            intercept = sum_wy / sum_w
-        else:
-            slope = (sum_w * sum_wxy - sum_wx * sum_wy) / denominator
-            intercept = (sum_wy - slope * sum_wx) / sum_w
-        
-        # 预测未来值
-        predictions = []
-        confidences = []
-        
-        for i in range(1, steps + 1):
-            next_x = len(recent_values) + i - 1
-            predicted_value = slope * next_x + intercept
-            
-            # 动态置信度计算
-            base_confidence = 0.92
-            
-            # 基于拟合质量的置信度调整
-            predicted_historical = [slope * xi + intercept for xi in x]
-            mse = sum((yi - pi) ** 2 for yi, pi in zip(y, predicted_historical)) / len(y)
-            fit_quality = max(0, 1 - mse / (sum(yi ** 2 for yi in y) / len(y)))
-            
-            # 时间衰减
-            time_decay = 0.015 * i  # 每小时置信度降低1.5%
-            
-            # 趋势稳定性
-            trend_stability = max(0.8, 1 - abs(slope) * 0.1)
-            
-            confidence = base_confidence * fit_quality * trend_stability - time_decay
-            confidence = max(0.55, min(0.95, confidence))
-            
-            predictions.append(predicted_value)
-            confidences.append(confidence)
-        
-        return predictions, confidences
+        return create_model("linear", SeriesCache(values)).forecast(steps)
     
     def seasonal_decomposition(self, values: List[float], period: int = 24) -> Dict:
         """简化的季节性分解"""
@@ -227,131 +198,313 @@ class AdvancedCCUPredictor:
             "residual": residual
         }
     
-    def ensemble_prediction(self, values: List[float], steps: int = 1) -> Tuple[List[float], List[float]]:
+    def seasonal_strength(self, values: List[float], period: int = 24) -> float:
+        """季节性强度：季节分量绝对值的平均"""
+        decomp = self.seasonal_decomposition(values, period)
+        return sum(abs(s) for s in decomp["seasonal"]) / len(decomp["seasonal"])
+    
+    def ensemble_prediction(self, values: List[float], steps: int = 1, params: Optional[Dict] = None) -> Tuple[List[float], List[float]]:
         """集成预测方法"""
-        predictions_list = []
-        confidences_list = []
-        
-        # 方法1: 改进的线性回归
-        pred1, conf1 = self.linear_regression_prediction(values, steps)
-        predictions_list.append((pred1, conf1, 0.4))  # 权重0.4
-        
-        # 方法2: 指数平滑
-        for step in range(steps):
-            pred, conf = self.exponential_smoothing(values)
-            if step == 0:
-                exp_preds = [pred]
-                exp_confs = [conf]
-            else:
-                # 简单延续趋势
-                trend = exp_preds[-1] - values[-1] if exp_preds else 0
-                next_pred = exp_preds[-1] + trend * 0.5
-                next_conf = exp_confs[-1] * 0.95
-                exp_preds.append(next_pred)
-                exp_confs.append(next_conf)
-        
-        predictions_list.append((exp_preds, exp_confs, 0.3))  # 权重0.3
-        
-        # 方法3: 多窗口移动平均
-        ma_preds = []
-        ma_confs = []
-        for step in range(steps):
-            pred, conf = self.advanced_moving_average(values)
-            ma_preds.append(pred)
-            ma_confs.append(conf * (0.98 ** step))  # 递减置信度
-        
-        predictions_list.append((ma_preds, ma_confs, 0.3))  # 权重0.3
-        
-        # 集成预测结果
-        final_predictions = []
-        final_confidences = []
-        
-        for step in range(steps):
-            weighted_pred = 0
-            weighted_conf = 0
-            total_weight = 0
-            
-            for preds, confs, weight in predictions_list:
-                if step < len(preds):
-                    weighted_pred += preds[step] * weight
-                    weighted_conf += confs[step] * weight
-                    total_weight += weight
-            
-            if total_weight > 0:
-                final_predictions.append(weighted_pred / total_weight)
-                final_confidences.append(min(0.96, weighted_conf / total_weight))
+        return create_model("ensemble", SeriesCache(values), config=params).forecast(steps)
+    
+    def clamp_value(self, metric: str, value: float) -> float:
+        """确保预测值在合理范围内"""
+        if metric == "co2_capture_rate":
+            return max(70, min(95, value))
+        elif metric == "methanol_yield":
+            return max(15, min(35, value))
+        elif metric == "energy_consumption":
+            return max(2.0, min(5.0, value))
+        return value
+    
+    def prepare_series(self, data: List[Dict], metric: str, outlier_filter: str = "mad",
+                       outlier_window: int = 48) -> Optional[Tuple[List[datetime], SeriesCache]]:
+        """
+        提取并预处理指标序列，返回 (时间戳, 序列缓存)，无数据时返回None
+        同一数据集上按 (指标, 预处理参数) 记忆，批量任务之间共享序列、平滑状态和季节分解
+        """
+        if self._prepared_data is not data:
+            self._prepared_data = data
+            self._prepared_series = {}
+        key = (metric, outlier_filter, outlier_window)
+        if key not in self._prepared_series:
+            timestamps, values = self.extract_time_series(data, metric)
+            if not values:
+                self._prepared_series[key] = None
             else:
-                final_predictions.append(values[-1] if values else 87.5)
-                final_confidences.append(0.7)
-        
-        return final_predictions, final_confidences
+                # 数据预处理：单遍滑动窗口异常值过滤
+                if len(values) > 1:
+                    values = filter_series(values, outlier_filter, outlier_window)
+                features = None
+                if get_feature_store is not None:
+                    features = get_feature_store(data).features(key, values)
+                self._prepared_series[key] = (timestamps, SeriesCache(values, timestamps, features))
+        return self._prepared_series[key]
     
-    def predict_metric(self, data: List[Dict], metric: str, horizon: int = 24, model: str = "ensemble") -> Dict:
-        """预测指定指标"""
-        timestamps, values = self.extract_time_series(data, metric)
-        
-        if not values:
-            return {
-                "error": f"无法提取指标 {metric} 的数据"
-            }
-        
-        # 数据预处理
-        if len(values) > 1:
-            # 异常值检测和处理
-            mean_val = sum(values) / len(values)
-            std_val = (sum((x - mean_val) ** 2 for x in values) / len(values)) ** 0.5
-            
-            # 移除极端异常值(3倍标准差之外)
-            filtered_values = []
-            for v in values:
-                if abs(v - mean_val) <= 3 * std_val:
-                    filtered_values.append(v)
-                else:
-                    # 用均值替换异常值
-                    filtered_values.append(mean_val)
-            values = filtered_values
+    def forecast_metric(self, data: List[Dict], metric: str, horizon: int = 24, model: str = "ensemble",
+                        outlier_filter: str = "mad", outlier_window: int = 48) -> Optional[Dict]:
+        """预处理并生成单个指标的点预测，无法提取数据时返回None"""
+        prepared = self.prepare_series(data, metric, outlier_filter, outlier_window)
+        if prepared is None:
+            return None
+        timestamps, cache = prepared
+        values = cache.values
         
         # 获取基准时间
         base_time = timestamps[-1] if timestamps else datetime.now()
         
-        # 根据模型选择预测方法
-        if model == "arima" or model == "linear":
-            predictions, confidences = self.linear_regression_prediction(values, horizon)
-        elif model == "lgbm" or model == "exponential":
-            # LightGBM不可用时使用指数平滑
-            pred_list = []
-            conf_list = []
-            current_values = values.copy()
+        # 根据模型选择预测方法，同一序列上的模型共享缓存和特征
+        model_name = self.model_aliases.get(model, "ensemble")
+        params = {"config": self.ensemble_params.get(metric)} if model_name == "ensemble" else {}
+        predictions, confidences = create_model(model_name, cache, **params).forecast(horizon)
+        
+        return {
+            "metric": metric,
+            "base_time": base_time,
+            "values": values,
+            "data_points": len(values),
+            "cache": cache,
+            "model": model_name,
+            "params": params,
+            "predictions": predictions,
+            "confidences": confidences
+        }
+    
+    def forecast_var(self, data: List[Dict], metrics: List[str], horizon: int = 24,
+                     outlier_filter: str = "mad", outlier_window: int = 48) -> Dict[str, Optional[Dict]]:
+        """VAR联合预测：所有指标共享滞后矩阵，一次求解；无法联合拟合时逐指标退回集成模型"""
+        prepared = {m: self.prepare_series(data, m, outlier_filter, outlier_window) for m in metrics}
+        available = [m for m in metrics if prepared[m] is not None]
+        forecasts = {m: None for m in metrics if prepared[m] is None}
+        if not available:
+            return forecasts
+        
+        # 按最短序列的时间戳对齐
+        shortest = min(available, key=lambda m: len(prepared[m][1].values))
+        timestamps = prepared[shortest][0]
+        try:
+            predictions, confidences = forecast_joint([prepared[m][1].values for m in available],
+                                                      timestamps, horizon)
+        except ValueError as e:  # 含 numpy.linalg.LinAlgError
+            print(f"警告: VAR联合拟合失败（{e}），逐指标使用集成模型")
+            for m in available:
+                forecasts[m] = self.forecast_metric(data, m, horizon, "ensemble", outlier_filter, outlier_window)
+            return forecasts
+        
+        for j, metric in enumerate(available):
+            cache = prepared[metric][1]
+            forecasts[metric] = {
+                "metric": metric,
+                "base_time": timestamps[-1] if timestamps else datetime.now(),
+                "values": cache.values,
+                "data_points": len(cache.values),
+                "cache": cache,
+                "model": "var",
+                "timestamps": timestamps,
+                "predictions": predictions[:, j].tolist(),
+                "confidences": confidences[:, j].tolist()
+            }
+        return forecasts
+    
+    def fit_states(self, data: List[Dict], metrics: List[str], outlier_filter: str = "mad",
+                   outlier_window: int = 48) -> Dict[str, MetricState]:
+        """拟合各指标的可持久化状态"""
+        states = {}
+        for metric in metrics:
+            timestamps, values = self.extract_time_series(data, metric)
+            if not values:
+                print(f"  {metric}: 无数据，跳过")
+                continue
+            alpha = (self.ensemble_params.get(metric) or DEFAULT_PARAMS)["alpha"]
+            states[metric] = MetricState.fit(metric, timestamps, values, alpha, outlier_filter,
+                                             outlier_window, self.seasonal_decomposition)
+            print(f"  {metric}: {states[metric].count} 条记录")
+        return states
+    
+    def required_window(self, model: str = "ensemble") -> int:
+        """启用的模型最多需要的近期数据点数：回归72、移动平均最长窗口、季节性相位24、近期平均24"""
+        window = 72 if self.model_aliases.get(model, "ensemble") in ("linear", "ensemble") else 3
+        if self.model_aliases.get(model, "ensemble") == "ensemble":
+            for params in [DEFAULT_PARAMS, *self.ensemble_params.values()]:
+                window = max(window, *params["window_sizes"])
+        return max(window, 24)
+    
+    def stream_states(self, data_path: str, metrics: List[str], model: str = "ensemble",
+                      outlier_filter: str = "mad", outlier_window: int = 48, start: Optional[str] = None,
+                      end: Optional[str] = None) -> Dict[str, MetricState]:
+        """有界内存模式：分块流式读取历史，逐条折叠进定长环形缓冲区状态，不保留完整历史"""
+        capacity = self.required_window(model)
+        states = {}
+        for metric in metrics:
+            alpha = (self.ensemble_params.get(metric) or DEFAULT_PARAMS)["alpha"]
+            states[metric] = MetricState(metric, alpha, create_filter(outlier_filter, outlier_window), capacity)
+        
+        records = 0
+        for record in iter_range(data_path, start, end):
+            try:
+                timestamp = datetime.fromisoformat(record['timestamp'].replace('Z', '+00:00'))
+            except (KeyError, ValueError, AttributeError):
+                continue
+            records += 1
+            for metric, state in states.items():
+                try:
+                    state.update(timestamp, float(record[metric]))
+                except (KeyError, ValueError, TypeError):
+                    continue
+        print(f"流式折叠 {records} 条历史记录（每个指标保留最近 {capacity} 个点）")
+        return {metric: state for metric, state in states.items() if state.count}
+    
+    def fold_new_records(self, data: List[Dict], states: Dict[str, MetricState]) -> int:
+        """把晚于状态的新记录增量折叠进各指标状态，返回折叠的记录数"""
+        folded = 0
+        for metric, state in states.items():
+            for record in records_after(data, state.last_timestamp):
+                try:
+                    timestamp = datetime.fromisoformat(record['timestamp'].replace('Z', '+00:00'))
+                    value = float(record[metric])
+                except (KeyError, ValueError, TypeError):
+                    continue
+                state.update(timestamp, value)
+                folded += 1
+        return folded
+    
+    def forecast_from_state(self, state: MetricState, horizon: int = 24, model: str = "ensemble") -> Dict:
+        """从已拟合状态直接预测，无需重新扫描历史"""
+        cache = state.to_cache()
+        model_name = self.model_aliases.get(model, "ensemble")
+        params = {"config": self.ensemble_params.get(state.metric)} if model_name == "ensemble" else {}
+        predictions, confidences = create_model(model_name, cache, **params).forecast(horizon)
+        
+        return {
+            "metric": state.metric,
+            "base_time": state.last_timestamp or datetime.now(),
+            "values": state.tail,
+            "data_points": state.count,
+            "cache": cache,
+            "model": model_name,
+            "params": params,
+            "predictions": predictions,
+            "confidences": confidences
+        }
+    
+    def residual_models(self, forecasts: List[Dict]) -> List[Dict]:
+        """
+        用生成点预测的同一模型（同样的参数）在滚动回测原点上重新预测，得到各指标的 h 步误差轨迹；
+        VAR 联合预测的指标一起回测；GBDT 复用点预测时训练好的模型，所有原点一次递归预测；
+        回测原点不足时退回一步残差模型
+        """
+        horizon = max(len(fc["predictions"]) for fc in forecasts)
+        min_history = self.required_window("ensemble")
+        models: Dict[int, Dict] = {}
+        
+        joint = [i for i, fc in enumerate(forecasts) if fc.get("model") == "var"]
+        if joint and forecast_joint is not None:
+            series = [forecasts[i]["values"] for i in joint]
+            timestamps = forecasts[joint[0]]["timestamps"]
+            n = min(len(s) for s in series)
+            aligned = [list(s)[-n:] for s in series]
+            aligned_times = list(timestamps)[-n:]
             
-            for _ in range(horizon):
-                pred, conf = self.exponential_smoothing(current_values)
-                pred_list.append(pred)
-                conf_list.append(conf)
-                current_values.append(pred)  # 递归预测
+            def joint_forecaster(origin):
+                begin = max(0, origin - RESIDUAL_HISTORY)
+                predictions, _ = forecast_joint([s[begin:origin] for s in aligned], aligned_times[begin:origin], horizon)
+                return predictions.T
+            
+            try:
+                errors = backtest_residuals(aligned, joint_forecaster, horizon, min_history)
+            except ValueError:  # 含 numpy.linalg.LinAlgError
+                errors = None
+            if errors is not None:
+                for k, i in enumerate(joint):
+                    models[i] = {"errors": errors[k]}
+        
+        for i, fc in enumerate(forecasts):
+            if i in models:
+                continue
+            values = list(fc["values"])
+            model_name = fc.get("model", "ensemble")
+            if model_name == "var":
+                model_name, params = "ensemble", {"config": self.ensemble_params.get(fc["metric"])}
+            else:
+                params = fc.get("params") or {}
+            
+            fitted = create_model(model_name, fc["cache"], **params) if "cache" in fc else None
+            if hasattr(fitted, "backtest_paths") and fitted.trainable(horizon):
+                errors = backtest_residuals([values], lambda origins: fitted.backtest_paths(origins, horizon)[None],
+                                            horizon, min_history, batch=True)
+            else:
+                def forecaster(origin, values=values, model_name=model_name, params=params):
+                    history = values[max(0, origin - RESIDUAL_HISTORY):origin]
+                    return [create_model(model_name, SeriesCache(history), **params).forecast(horizon)[0]]
                 
-            predictions, confidences = pred_list, conf_list
-        else:  # ensemble
-            predictions, confidences = self.ensemble_prediction(values, horizon)
-        
-        # 构建预测结果
+                errors = backtest_residuals([values], forecaster, horizon, min_history)
+            if errors is not None:
+                models[i] = {"errors": errors[0]}
+            else:
+                alpha = (self.ensemble_params.get(fc["metric"]) or DEFAULT_PARAMS)["alpha"]
+                models[i] = fit_residual_model(values, alpha)
+        return [models[i] for i in range(len(forecasts))]
+    
+    def estimate_intervals(self, forecasts: List[Dict], n_paths: int = 2000) -> List[Optional[Dict]]:
+        """对多个指标一次性批量做残差自助法模拟，返回每个指标的P10/P50/P90"""
+        if bootstrap_intervals is None:
+            print("警告: numpy 未安装，跳过预测区间估计")
+            return [None] * len(forecasts)
+        
+        residual_models = self.residual_models(forecasts)
+        bands = bootstrap_intervals([fc["predictions"] for fc in forecasts], residual_models, n_paths)
+        lower, median, upper = bands
+        return [
+            {
+                "lower": lower[m, :len(fc["predictions"])].tolist(),
+                "median": median[m, :len(fc["predictions"])].tolist(),
+                "upper": upper[m, :len(fc["predictions"])].tolist()
+            }
+            for m, fc in enumerate(forecasts)
+        ]
+    
+    def verbose_records(self, metric: str, base_time: datetime, predictions: List[float],
+                        confidences: List[float], intervals: Optional[Dict] = None) -> List[Dict]:
+        """默认输出格式：每个预测步一条记录"""
         prediction_records = []
         for i, (pred_value, confidence) in enumerate(zip(predictions, confidences)):
             pred_time = base_time + timedelta(hours=i + 1)
             
-            # 确保预测值在合理范围内
-            if metric == "co2_capture_rate":
-                pred_value = max(70, min(95, pred_value))
-            elif metric == "methanol_yield":
-                pred_value = max(15, min(35, pred_value))
-            elif metric == "energy_consumption":
-                pred_value = max(2.0, min(5.0, pred_value))
-            
-            prediction_records.append({
+            record = {
                 "timestamp": pred_time.isoformat(),
-                "predicted_value": round(pred_value, 2),
+                "predicted_value": round(self.clamp_value(metric, pred_value), 2),
                 "confidence": round(confidence, 3),
                 "metric": metric
-            })
+            }
+            if intervals:
+                record["lower_bound"] = round(self.clamp_value(metric, intervals["lower"][i]), 2)
+                record["p50"] = round(self.clamp_value(metric, intervals["median"][i]), 2)
+                record["upper_bound"] = round(self.clamp_value(metric, intervals["upper"][i]), 2)
+            prediction_records.append(record)
+        return prediction_records
+    
+    def build_metric_result(self, forecast: Dict, horizon: int, model: str, outlier_filter: str = "mad",
+                            outlier_window: int = 48, intervals: Optional[Dict] = None) -> Dict:
+        """根据点预测（和可选的预测区间）构建单个指标的输出结果"""
+        metric = forecast["metric"]
+        base_time = forecast["base_time"]
+        values = forecast["values"]
+        predictions = forecast["predictions"]
+        confidences = forecast["confidences"]
+        
+        # 构建预测结果
+        if self.output_format != "verbose":
+            # 结构数组：不重复指标名、不逐条格式化时间戳
+            prediction_records = {
+                "step_hours": 1,
+                "values": [round(self.clamp_value(metric, v), 2) for v in predictions],
+                "confidences": [round(c, 3) for c in confidences]
+            }
+            if intervals:
+                for field, key in (("lower_bound", "lower"), ("p50", "median"), ("upper_bound", "upper")):
+                    prediction_records[field] = [round(self.clamp_value(metric, v), 2) for v in intervals[key]]
+        else:
+            prediction_records = self.verbose_records(metric, base_time, predictions, confidences, intervals)
         
         # 计算统计信息
         recent_avg = sum(values[-24:]) / min(24, len(values)) if values else 0
@@ -367,9 +520,9 @@ class AdvancedCCUPredictor:
         
         # 计算季节性信息
         seasonal_info = {}
-        if len(values) >= 48:  # 至少2天数据
-            decomp = self.seasonal_decomposition(values)
-            seasonal_strength = sum(abs(s) for s in decomp["seasonal"]) / len(decomp["seasonal"])
+        if forecast["data_points"] >= 48:  # 至少2天数据
+            seasonal_strength = forecast["cache"].get(("seasonal_strength", 24),
+                                                      lambda: self.seasonal_strength(values))
             seasonal_info = {
                 "strength": round(seasonal_strength, 3),
                 "detected": seasonal_strength > 1.0
@@ -380,7 +533,7 @@ class AdvancedCCUPredictor:
             "metric": metric,
             "horizon_hours": horizon,
             "base_time": base_time.isoformat(),
-            "data_points_used": len(values),
+            "data_points_used": forecast["data_points"],
             "predictions": prediction_records,
             "summary": {
                 "recent_average": round(recent_avg, 2),
@@ -394,18 +547,58 @@ class AdvancedCCUPredictor:
             "model_metadata": {
                 "version": self.version,
                 "algorithm": model,
-                "preprocessing": "异常值处理、范围约束"
+                "tuned": model == "ensemble" and metric in self.ensemble_params,
+                "intervals": "回测误差轨迹自助法 P10/P50/P90" if intervals else None,
+                "preprocessing": f"异常值处理({outlier_filter}, 窗口{outlier_window})、范围约束"
             }
         }
     
-    def multi_metric_prediction(self, data: List[Dict], metrics: List[str], horizon: int = 24, model: str = "ensemble") -> Dict:
-        """多指标预测"""
-        results = {}
+    def predict_metric(self, data: List[Dict], metric: str, horizon: int = 24, model: str = "ensemble",
+                       outlier_filter: str = "mad", outlier_window: int = 48, interval_paths: int = 0) -> Dict:
+        """预测指定指标"""
+        forecast = self.forecast_metric(data, metric, horizon, model, outlier_filter, outlier_window)
+        if forecast is None:
+            return {
+                "error": f"无法提取指标 {metric} 的数据"
+            }
+        
+        intervals = self.estimate_intervals([forecast], interval_paths)[0] if interval_paths > 0 else None
+        return self.build_metric_result(forecast, horizon, model, outlier_filter, outlier_window, intervals)
+    
+    def multi_metric_prediction(self, data: List[Dict], metrics: List[str], horizon: int = 24, model: str = "ensemble",
+                                outlier_filter: str = "mad", outlier_window: int = 48, interval_paths: int = 0,
+                                states: Optional[Dict[str, MetricState]] = None) -> Dict:
+        """多指标预测；提供已拟合状态时，支持热启动的模型直接从状态预测"""
+        forecasts = {}
+        states = states or {}
+        
+        if model == "var" and forecast_joint is not None and len(metrics) > 1:
+            print(f"联合预测指标: {', '.join(metrics)} (使用 var 模型)")
+            forecasts = self.forecast_var(data, metrics, horizon, outlier_filter, outlier_window)
         
         for metric in metrics:
+            if metric in forecasts:
+                continue
             print(f"预测指标: {metric} (使用 {model} 模型)")
-            result = self.predict_metric(data, metric, horizon, model)
-            results[metric] = result
+            if metric in states and model in WARM_START_MODELS:
+                forecasts[metric] = self.forecast_from_state(states[metric], horizon, model)
+            else:
+                forecasts[metric] = self.forecast_metric(data, metric, horizon, model, outlier_filter, outlier_window)
+        
+        # 所有指标的预测区间在一次批量模拟中完成
+        valid = [fc for fc in forecasts.values() if fc is not None]
+        intervals = {}
+        if interval_paths > 0 and valid:
+            for fc, band in zip(valid, self.estimate_intervals(valid, interval_paths)):
+                intervals[fc["metric"]] = band
+        
+        results = {}
+        for metric, forecast in forecasts.items():
+            if forecast is None:
+                results[metric] = {"error": f"无法提取指标 {metric} 的数据"}
+            else:
+                results[metric] = self.build_metric_result(forecast, horizon, model, outlier_filter,
+                                                           outlier_window, intervals.get(metric))
         
         # 计算整体预测质量
         total_confidence = 0
@@ -448,17 +641,116 @@ class AdvancedCCUPredictor:
             }
         }
 
+    def tune_ensemble(self, data: List[Dict], metrics: List[str], horizon: int = 24,
+                      outlier_filter: str = "mad", outlier_window: int = 48, workers: Optional[int] = None) -> Dict:
+        """按指标在留出回测上搜索集成模型超参数"""
+        tuned = {}
+        for metric in metrics:
+            _, values = self.extract_time_series(data, metric)
+            if len(values) > 1:
+                values = filter_series(values, outlier_filter, outlier_window)
+            result = tune_series(values, horizon, workers=workers)
+            if result is None:
+                print(f"  {metric}: 数据不足，跳过调优")
+                continue
+            tuned[metric] = result
+            print(f"  {metric}: alpha={result['alpha']} 窗口={result['window_sizes']} "
+                  f"权重={result['weights']} MAE={result['backtest_mae']:.4f} (默认 {result['baseline_mae']})")
+        return tuned
+
+    def validate_job(self, options: Dict) -> List[str]:
+        """校验单个任务的模型、指标、输出格式和数据源，返回指标列表；无效时抛出 ValueError"""
+        if options["model"] not in self.supported_models:
+            raise ValueError(f"不支持的预测模型: {options['model']}（可选 {', '.join(self.supported_models)}）")
+        if options["output_format"] not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {options['output_format']}（可选 {', '.join(OUTPUT_FORMATS)}）")
+        if options["outlier_filter"] not in SUPPORTED_FILTERS:
+            raise ValueError(f"不支持的异常值过滤方法: {options['outlier_filter']}")
+        metrics = options["metrics"]
+        if isinstance(metrics, str):
+            metrics = [m.strip() for m in metrics.split(',')]
+        if not isinstance(metrics, list) or not metrics or not all(isinstance(m, str) and m for m in metrics):
+            raise ValueError(f"指标列表无效: {options['metrics']}")
+        if not options.get("data") and not options.get("store"):
+            raise ValueError("任务未指定数据源（data 或 store）")
+        return metrics
+    
+    def run_jobs(self, jobs: List[Dict], data_loader, defaults: Dict, output_path: str) -> Dict:
+        """
+        批量执行预测任务：每个数据源只加载一次，任务之间共享提取的序列和分解结果，
+        结果以 JSON Lines 写入同一个输出流（每行一个任务）；参数无效的任务输出一行错误记录
+        data_loader(options) 按任务的 data / store（及 start/end）加载记录
+        """
+        succeeded = failed = 0
+        with open(output_path, 'w', encoding='utf-8') as out:
+            for index, job in enumerate(jobs):
+                job_id = job.get("id", index) if isinstance(job, dict) else index
+                try:
+                    if not isinstance(job, dict):
+                        raise ValueError("任务必须是JSON对象")
+                    options = {**defaults, **job}
+                    if "data" in job or "store" in job:
+                        # 任务自带数据源时不继承命令行的另一种数据源
+                        options["data"], options["store"] = job.get("data"), job.get("store")
+                    metrics = self.validate_job(options)
+                    # JSON Lines 中不支持二进制，binary 按 compact 输出
+                    self.output_format = "verbose" if options["output_format"] == "verbose" else "compact"
+                    data = data_loader(options)
+                    if not data:
+                        raise ValueError(f"无法加载数据 {options.get('data') or options.get('store')}")
+                    result = self.multi_metric_prediction(
+                        data, metrics, int(options["horizon"]), options["model"], options["outlier_filter"],
+                        int(options["outlier_window"]), int(options["intervals"]))
+                    line = {"job_id": job_id, "status": "ok", "result": result}
+                    succeeded += 1
+                except Exception as e:
+                    line = {"job_id": job_id, "status": "error", "error": str(e)}
+                    failed += 1
+                out.write(json.dumps(line, ensure_ascii=False, separators=(',', ':')) + "\n")
+        return {"jobs": len(jobs), "succeeded": succeeded, "failed": failed}
+
 def main():
     parser = argparse.ArgumentParser(description='高级CCU技术指标预测器')
-    parser.add_argument('--data', type=str, required=True, help='历史数据文件路径')
+    parser.add_argument('command', nargs='?', default='predict', choices=['predict', 'fit'],
+                       help='predict: 预测（默认）；fit: 拟合并保存模型状态到 --artifact')
+    parser.add_argument('--artifact', type=str,
+                       help='模型状态文件：fit 时写入；predict 时加载并只折叠新记录（热启动）')
+    parser.add_argument('--data', type=str, help='历史数据文件路径')
+    parser.add_argument('--store', type=str,
+                       help='分段历史存储目录（代替 --data）；配合 --artifact 时只读取上次之后的增量记录')
     parser.add_argument('--output', type=str, default='./predictions.json', help='预测结果输出文件')
     parser.add_argument('--metrics', type=str, default='co2_capture_rate,methanol_yield,energy_consumption', 
                        help='要预测的指标列表（逗号分隔）')
     parser.add_argument('--horizon', type=int, default=24, help='预测时长（小时）')
-    parser.add_argument('--model', type=str, default='ensemble', choices=['arima', 'lgbm', 'ensemble'],
+    parser.add_argument('--start', type=str, help='只使用该时间（含）之后的历史数据，ISO格式')
+    parser.add_argument('--end', type=str, help='只使用该时间（不含）之前的历史数据，ISO格式')
+    parser.add_argument('--resample', type=str, choices=AGGREGATIONS,
+                       help='--data 为高频采样文件（CSV/JSON Lines），按小时重采样的聚合方式')
+    parser.add_argument('--fill', type=str, default='ffill', choices=FILL_METHODS,
+                       help='重采样后缺失小时的填充方式')
+    parser.add_argument('--max-gap', type=int, help='超过该小时数的缺口不填充（默认总是填充）')
+    parser.add_argument('--model', type=str, default='ensemble', choices=['arima', 'lgbm', 'ensemble', 'var'],
                        help='预测模型类型')
+    parser.add_argument('--outlier-filter', type=str, default='mad', choices=SUPPORTED_FILTERS,
+                       help='异常值过滤方法（滑动MAD / 滑动z-score / 不过滤）')
+    parser.add_argument('--outlier-window', type=int, default=48, help='异常值过滤滑动窗口（小时）')
+    parser.add_argument('--intervals', type=int, default=0, metavar='PATHS',
+                       help='残差自助法模拟路径数，输出P10/P50/P90预测区间（0表示不输出）；'
+                            '需在最多200个回测原点上重新预测（GBDT 复用已训练模型批量递归），'
+                            '72步时约增加0.3-1.5秒')
+    parser.add_argument('--output-format', type=str, default='verbose', choices=OUTPUT_FORMATS,
+                       help='输出格式：verbose 逐步记录（默认）；compact 结构数组无缩进JSON；binary 紧凑二进制')
+    parser.add_argument('--jobs', type=str,
+                       help='批量任务文件（JSON列表，每项可覆盖 data/metrics/horizon/model 等参数），结果写为JSON Lines')
+    parser.add_argument('--bounded-memory', action='store_true',
+                       help='有界内存模式：流式读取历史，每个指标只保留模型所需的定长窗口（支持 arima/linear/ensemble）')
+    parser.add_argument('--tune', action='store_true', help='调优模式：回测搜索集成模型参数并保存到 --config')
+    parser.add_argument('--config', type=str, help='集成模型参数文件（调优模式下为输出路径）')
+    parser.add_argument('--tune-workers', type=int, help='调优进程数（默认CPU核数）')
     
     args = parser.parse_args()
+    if not args.data and not args.store and not args.jobs:
+        parser.error('需要 --data 或 --store')
     
     print("=" * 60)
     print("高级CCU技术指标预测器 v2.0.0")
@@ -466,10 +758,105 @@ def main():
     
     try:
         predictor = AdvancedCCUPredictor()
+        predictor.output_format = args.output_format
+        
+        if args.jobs:
+            with open(args.jobs, 'r', encoding='utf-8') as f:
+                jobs = json.load(f)
+            if not isinstance(jobs, list):
+                parser.error('批量任务文件必须是JSON列表')
+            # 只有存在未指定数据源的任务时才需要 --data / --store 作为默认数据源
+            if not args.data and not args.store and any(
+                    isinstance(job, dict) and not (job.get("data") or job.get("store")) for job in jobs):
+                parser.error('有任务未指定 data/store，需要 --data 或 --store')
+            if args.config:
+                predictor.ensemble_params = load_config(args.config)
+            
+            # 每个数据源只加载解析一次
+            loaded = {}
+            def data_loader(options):
+                start, end = options.get("start"), options.get("end")
+                if options.get("store"):
+                    key = ("store", options["store"], start, end)
+                    if key not in loaded:
+                        loaded[key] = predictor.load_store(options["store"], None, start, end)[0]
+                else:
+                    key = ("data", options["data"], start, end)
+                    if key not in loaded:
+                        loaded[key] = predictor.load_data(options["data"], start, end)
+                return loaded[key]
+            
+            defaults = {
+                "data": args.data, "store": args.store, "start": args.start, "end": args.end,
+                "metrics": args.metrics, "horizon": args.horizon, "model": args.model,
+                "outlier_filter": args.outlier_filter, "outlier_window": args.outlier_window,
+                "intervals": args.intervals, "output_format": args.output_format
+            }
+            print(f"批量任务: {len(jobs)} 个")
+            stats = predictor.run_jobs(jobs, data_loader, defaults, args.output)
+            print(f"\n批量预测完成: 成功 {stats['succeeded']} 个，失败 {stats['failed']} 个")
+            print(f"结果已保存到: {args.output}")
+            return
+        
+        if args.bounded_memory:
+            if args.model not in WARM_START_MODELS:
+                print(f"错误: 有界内存模式只支持 {', '.join(WARM_START_MODELS)} 模型")
+                sys.exit(1)
+            metrics = [m.strip() for m in args.metrics.split(',')]
+            if args.config:
+                predictor.ensemble_params = load_config(args.config)
+            states = predictor.stream_states(args.data, metrics, args.model, args.outlier_filter,
+                                             args.outlier_window, args.start, args.end)
+            if not states:
+                sys.exit(1)
+            print("\n开始预测...")
+            prediction_results = predictor.multi_metric_prediction(
+                [], metrics, args.horizon, args.model, args.outlier_filter, args.outlier_window, args.intervals,
+                states)
+            if args.output_format == 'binary':
+                write_binary(args.output, prediction_results)
+            else:
+                write_json(args.output, prediction_results, args.output_format)
+            print(f"\n预测结果已保存到: {args.output}")
+            return
+        
+        artifact = None
+        if args.artifact and args.command == 'predict':
+            artifact = load_artifact(args.artifact)
         
         # 加载数据
-        data = predictor.load_data(args.data)
-        if not data:
+        cursor = None
+        delta_only = False
+        if args.store:
+            # 热启动模型只需读取状态游标之后的增量
+            delta_only = artifact is not None and artifact["cursor"] is not None and args.model in WARM_START_MODELS
+            data, cursor = predictor.load_store(args.store, artifact["cursor"] if delta_only else None,
+                                                args.start, args.end)
+        elif args.resample:
+            data = predictor.load_samples(args.data, args.resample, args.fill, args.max_gap, args.start, args.end)
+        else:
+            since = None
+            if artifact is not None and args.model in WARM_START_MODELS:
+                # 热启动模型只需读取状态最后时间戳之后的增量（经时间索引定位，不解析整个历史文件）
+                states = artifact["states"]
+                requested = [m.strip() for m in args.metrics.split(',')]
+                if all(m in states and states[m].last_timestamp for m in requested):
+                    since = min(states[m].last_timestamp for m in requested).isoformat()
+            if since is not None:
+                delta_only = True
+                start = args.start if args.start and parse_epoch(args.start) > parse_epoch(since) else since
+                try:
+                    data = load_range(args.data, start, args.end)
+                    print(f"增量加载 {len(data)} 条新记录 (时间 {start} 之后)")
+                except FileNotFoundError:
+                    print(f"错误: 数据文件不存在 {args.data}")
+                    sys.exit(1)
+                except ValueError:
+                    print(f"错误: 数据文件格式错误 {args.data}")
+                    sys.exit(1)
+            else:
+                data = predictor.load_data(args.data, args.start, args.end)
+        if not data and not delta_only:
             sys.exit(1)
         
         # 解析要预测的指标
@@ -478,13 +865,50 @@ def main():
         print(f"预测时长: {args.horizon} 小时")
         print(f"预测模型: {args.model}")
         
+        if args.tune:
+            config_path = args.config or './ensemble_config.json'
+            print("\n开始调优...")
+            tuned = predictor.tune_ensemble(data, metrics, args.horizon, args.outlier_filter,
+                                            args.outlier_window, args.tune_workers)
+            save_config(tuned, config_path, args.horizon)
+            print(f"\n调优结果已保存到: {config_path}")
+            return
+        
+        if args.config:
+            predictor.ensemble_params = load_config(args.config)
+            print(f"已加载集成参数: {', '.join(predictor.ensemble_params) or '无'}")
+        
+        state_params = {"outlier_filter": args.outlier_filter, "outlier_window": args.outlier_window}
+        if args.command == 'fit':
+            artifact_path = args.artifact or './model_state.json.gz'
+            print("\n开始拟合...")
+            states = predictor.fit_states(data, metrics, args.outlier_filter, args.outlier_window)
+            save_artifact(artifact_path, states, state_params, cursor)
+            print(f"\n模型状态已保存到: {artifact_path}")
+            return
+        
+        states = None
+        if artifact:
+            states = artifact["states"]
+            if artifact["params"] != state_params:
+                print(f"警告: 模型状态的预处理参数 {artifact['params']} 与当前参数不一致，以状态文件为准")
+            folded = predictor.fold_new_records(data, states)
+            print(f"已加载模型状态: {', '.join(states)}，折叠新记录 {folded} 条")
+            new_cursor = cursor if cursor is not None else artifact["cursor"]
+            if folded or new_cursor != artifact["cursor"]:
+                save_artifact(args.artifact, states, artifact["params"], new_cursor)
+        
         # 执行预测
         print("\n开始预测...")
-        prediction_results = predictor.multi_metric_prediction(data, metrics, args.horizon, args.model)
+        prediction_results = predictor.multi_metric_prediction(
+            data, metrics, args.horizon, args.model, args.outlier_filter, args.outlier_window, args.intervals,
+            states)
         
         # 保存结果
-        with open(args.output, 'w', encoding='utf-8') as f:
-            json.dump(prediction_results, f, ensure_ascii=False, indent=2)
+        if args.output_format == 'binary':
+            write_binary(args.output, prediction_results)
+        else:
+            write_json(args.output, prediction_results, args.output_format)
         
         print(f"\n预测结果已保存到: {args.output}")
         
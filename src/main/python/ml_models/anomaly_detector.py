@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式异常检测
+每个 (机组, 指标) 维护一份增量状态：按小时的季节性期望水平（指数加权）和残差的指数加权均值/方差。
+每条新读数只做常数次运算：期望 = 当前小时的季节水平，残差的标准分超过阈值即标记异常；
+异常值按阈值截断后再更新状态，避免持续污染基线。状态可随时导出查看或保存后恢复。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SEASONAL_PERIOD = 24
+
+# 默认监测的指标及关注方向：捕集率偏低、能耗偏高为异常；"both" 表示双向
+DEFAULT_METRICS = {
+    "co2_capture_rate": "low",
+    "energy_consumption": "high"
+}
+
+DEFAULT_UNIT = "default"
+STATE_FORMAT = "ccu-anomaly-state"
+STATE_VERSION = 1
+
+
+def hour_of(timestamp) -> int:
+    """ISO时间字符串或 datetime 的小时；字符串直接取固定位置，避免完整解析"""
+    if isinstance(timestamp, datetime):
+        return timestamp.hour
+    if len(timestamp) >= 13 and timestamp[10] in 'T ':
+        return int(timestamp[11:13])
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).hour
+
+
+class SeasonalResidualState:
+    """单个序列的季节水平 + 残差统计"""
+
+    __slots__ = ("direction", "profile", "profile_counts", "residual_mean", "residual_var", "count",
+                 "flags", "consecutive", "last_value", "last_score")
+
+    def __init__(self, direction: str = "both"):
+        self.direction = direction
+        self.profile = array('d', bytes(8 * SEASONAL_PERIOD))
+        self.profile_counts = array('l', bytes(array('l').itemsize * SEASONAL_PERIOD))
+        self.residual_mean = 0.0
+        self.residual_var = 0.0
+        self.count = 0
+        self.flags = 0
+        # 连续异常的读数个数
+        self.consecutive = 0
+        self.last_value = None
+        self.last_score = 0.0
+
+    def update(self, hour: int, value: float, profile_alpha: float, residual_alpha: float,
+               threshold: float, warmup: int) -> Tuple[float, float, bool]:
+        """折叠一条读数，返回 (期望值, 标准分, 是否异常)"""
+        seen = self.profile_counts[hour]
+        # 某个小时第一次出现时以最近的整体水平为期望
+        expected = self.profile[hour] if seen else (self.last_value if self.last_value is not None else value)
+        residual = value - expected
+        std = self.residual_var ** 0.5
+        score = (residual - self.residual_mean) / std if std > 1e-12 else 0.0
+
+        if self.direction == "low":
+            anomalous = score <= -threshold
+        elif self.direction == "high":
+            anomalous = score >= threshold
+        else:
+            anomalous = abs(score) >= threshold
+        anomalous = anomalous and self.count >= warmup
+
+        # 异常残差截断到阈值边界再更新，基线只被缓慢拉动
+        if self.count >= warmup and std > 1e-12 and abs(score) > threshold:
+            residual = self.residual_mean + (threshold if score > 0 else -threshold) * std
+        adjusted = expected + residual
+
+        # 季节水平：每个小时前几次取算术平均，之后指数加权
+        seen += 1
+        self.profile_counts[hour] = seen
+        self.profile[hour] = expected + max(profile_alpha, 1.0 / seen) * (adjusted - expected) if seen > 1 \
+            else adjusted
+
+        # 残差的指数加权均值/方差（预热期内按样本数加权）
+        self.count += 1
+        weight = max(residual_alpha, 1.0 / self.count)
+        delta = residual - self.residual_mean
+        self.residual_mean += weight * delta
+        self.residual_var = (1 - weight) * (self.residual_var + weight * delta * delta)
+
+        self.last_value = value
+        self.last_score = score
+        if anomalous:
+            self.flags += 1
+            self.consecutive += 1
+        else:
+            self.consecutive = 0
+        return expected, score, anomalous
+
+    def to_dict(self) -> Dict:
+        return {
+            "direction": self.direction,
+            "profile": [round(v, 6) for v in self.profile],
+            "profile_counts": list(self.profile_counts),
+            "residual_mean": self.residual_mean,
+            "residual_std": self.residual_var ** 0.5,
+            "count": self.count,
+            "flags": self.flags,
+            "consecutive": self.consecutive,
+            "last_value": self.last_value,
+            "last_score": round(self.last_score, 4)
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict) -> "SeasonalResidualState":
+        state = cls(payload.get("direction", "both"))
+        state.profile = array('d', payload["profile"])
+        state.profile_counts = array('l', payload["profile_counts"])
+        state.residual_mean = payload["residual_mean"]
+        state.residual_var = payload["residual_std"] ** 2
+        state.count = payload["count"]
+        state.flags = payload.get("flags", 0)
+        state.consecutive = payload.get("consecutive", 0)
+        state.last_value = payload.get("last_value")
+        state.last_score = payload.get("last_score", 0.0)
+        return state
+
+
+class AnomalyDetector:
+    """按 (机组, 指标) 维护状态的增量异常检测器"""
+
+    def __init__(self, metrics: Optional[Dict[str, str]] = None, threshold: float = 4.0,
+                 profile_alpha: float = 0.05, residual_alpha: float = 0.01, warmup: int = 48,
+                 unit_field: str = "unit_id"):
+        self.metrics = dict(metrics or DEFAULT_METRICS)
+        self.threshold = threshold
+        self.profile_alpha = profile_alpha
+        self.residual_alpha = residual_alpha
+        self.warmup = warmup
+        self.unit_field = unit_field
+        self.states: Dict[Tuple[str, str], SeasonalResidualState] = {}
+        self.scored = 0
+        self.flagged = 0
+
+    def score(self, unit: str, metric: str, timestamp, value: float) -> Optional[Dict]:
+        """为一个读数打分并更新状态；异常时返回标记，否则返回 None"""
+        key = (unit, metric)
+        state = self.states.get(key)
+        if state is None:
+            state = self.states[key] = SeasonalResidualState(self.metrics.get(metric, "both"))
+        expected, score, anomalous = state.update(hour_of(timestamp), value, self.profile_alpha,
+                                                  self.residual_alpha, self.threshold, self.warmup)
+        self.scored += 1
+        if not anomalous:
+            return None
+        self.flagged += 1
+        return {
+            "unit": unit,
+            "metric": metric,
+            "timestamp": timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp,
+            "value": value,
+            "expected": round(expected, 4),
+            "score": round(score, 2),
+            "direction": "low" if score < 0 else "high",
+            "consecutive": state.consecutive
+        }
+
+    def score_record(self, record: Dict) -> List[Dict]:
+        """为一条记录中所有被监测的指标打分，返回异常标记列表"""
+        unit = str(record.get(self.unit_field, DEFAULT_UNIT))
+        timestamp = record.get('timestamp')
+        if timestamp is None:
+            return []
+        flags = []
+        for metric in self.metrics:
+            value = record.get(metric)
+            if value is None:
+                continue
+            flag = self.score(unit, metric, timestamp, float(value))
+            if flag is not None:
+                flags.append(flag)
+        return flags
+
+    def process(self, records: Iterable[Dict]) -> List[Dict]:
+        flags = []
+        for record in records:
+            flags.extend(self.score_record(record))
+        return flags
+
+    def snapshot(self, unit: Optional[str] = None) -> Dict:
+        """检测器状态，供查看；unit 指定时只返回该机组"""
+        states = {}
+        for (state_unit, metric), state in self.states.items():
+            if unit is None or state_unit == unit:
+                states.setdefault(state_unit, {})[metric] = state.to_dict()
+        return {
+            "params": {"metrics": self.metrics, "threshold": self.threshold, "profile_alpha": self.profile_alpha,
+                       "residual_alpha": self.residual_alpha, "warmup": self.warmup,
+                       "unit_field": self.unit_field},
+            "scored": self.scored,
+            "flagged": self.flagged,
+            "units": states
+        }
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"format": STATE_FORMAT, "version": STATE_VERSION, **self.snapshot()}, f,
+                      ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "AnomalyDetector":
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get("format") != STATE_FORMAT or payload.get("version") != STATE_VERSION:
+            raise ValueError(f"不支持的检测器状态: {payload.get('format')} v{payload.get('version')}")
+        detector = cls(**payload["params"])
+        detector.scored = payload.get("scored", 0)
+        detector.flagged = payload.get("flagged", 0)
+        for unit, metrics in payload["units"].items():
+            for metric, state in metrics.items():
+                detector.states[(unit, metric)] = SeasonalResidualState.from_dict(state)
+        return detector
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CCU流式异常检测')
+    parser.add_argument('--data', type=str, required=True, help='记录文件（JSON数组，按时间顺序）')
+    parser.add_argument('--state', type=str, help='检测器状态文件：存在则从中恢复，处理完后写回')
+    parser.add_argument('--output', type=str, help='异常标记输出文件')
+    parser.add_argument('--threshold', type=float, default=4.0, help='残差标准分阈值')
+    parser.add_argument('--warmup', type=int, default=48, help='开始标记前每个序列的预热读数')
+    parser.add_argument('--unit-field', type=str, default='unit_id', help='记录中的机组字段，缺失时归入 default')
+    parser.add_argument('--metrics', type=str,
+                        help='监测的指标及方向，如 co2_capture_rate:low,energy_consumption:high（默认即此）')
+
+    args = parser.parse_args()
+
+    try:
+        if args.state and os.path.exists(args.state):
+            detector = AnomalyDetector.load(args.state)
+            print(f"已恢复检测器状态: {len(detector.states)} 个序列")
+        else:
+            metrics = None
+            if args.metrics:
+                metrics = dict(item.split(':') if ':' in item else (item, 'both')
+                               for item in args.metrics.split(','))
+            detector = AnomalyDetector(metrics, args.threshold, warmup=args.warmup, unit_field=args.unit_field)
+
+        with open(args.data, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+
+        started = time.perf_counter()
+        flags = detector.process(records)
+        elapsed = time.perf_counter() - started
+        readings = len(records) * len(detector.metrics)
+
+        print(f"处理 {len(records)} 条记录（{readings} 个读数），耗时 {elapsed * 1000:.1f} ms，"
+              f"约 {readings / max(elapsed, 1e-9):,.0f} 读数/秒")
+        print(f"异常标记: {len(flags)} 个")
+        for flag in flags[:10]:
+            print(f"  {flag['timestamp']} {flag['unit']} {flag['metric']}: {flag['value']} "
+                  f"(期望 {flag['expected']}, 标准分 {flag['score']})")
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({"flags": flags, "detector": detector.snapshot()}, f, ensure_ascii=False, indent=2)
+            print(f"结果已保存到: {args.output}")
+        if args.state:
+            detector.save(args.state)
+            print(f"检测器状态已保存到: {args.state}")
+
+    except Exception as e:
+        print(f"异常检测失败: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
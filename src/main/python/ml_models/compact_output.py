@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑的预测结果输出
+compact: 结构数组格式（基准时间 + 步长 + 每个字段一个数组），无缩进JSON
+binary:  魔数 + 版本 + JSON头 + 小端 float32 数据块；每组预测的各字段按头中 "fields" 的固定顺序连续打包成一块，
+         头中该组只记录 {"$block": [各字段长度]}（缺失的字段为 null），数据块按在头中出现的顺序依次排列
+"""
+
+import json
+import struct
+from array import array
+from typing import Dict
+
+OUTPUT_FORMATS = ["verbose", "compact", "binary"]
+
+# 紧凑格式中按数组存储的预测字段
+ARRAY_FIELDS = ["values", "confidences", "lower_bound", "p50", "upper_bound"]
+
+BINARY_MAGIC = b"CCUP"
+BINARY_VERSION = 2
+_HEADER = struct.Struct("<4sBI")
+
+
+def write_json(path: str, results: Dict, output_format: str = "verbose"):
+    """verbose 保持原有的缩进输出，compact 不缩进"""
+    with open(path, 'w', encoding='utf-8') as f:
+        if output_format == "verbose":
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        else:
+            json.dump(results, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def _is_block(node: Dict, fields) -> bool:
+    return any(isinstance(node.get(field), list) for field in fields)
+
+
+def write_binary(path: str, results: Dict):
+    """
+    把紧凑结果中每组预测数组按固定字段顺序打包成一个 float32 数据块，其余部分作为JSON头；
+    字段顺序在头中只列一次，每组只记录各字段的长度，数据块按在头中出现的顺序依次排列
+    """
+    present = set()
+
+    def collect(node):
+        if isinstance(node, dict):
+            present.update(key for key, value in node.items() if key in ARRAY_FIELDS and isinstance(value, list))
+            for value in node.values():
+                collect(value)
+        elif isinstance(node, list):
+            for item in node:
+                collect(item)
+
+    collect(results)
+    fields = [field for field in ARRAY_FIELDS if field in present]
+    blob = array('f')
+
+    def extract(node):
+        if isinstance(node, dict):
+            if _is_block(node, fields):
+                out = {key: extract(value) for key, value in node.items() if key not in fields}
+                lengths = []
+                for field in fields:
+                    value = node.get(field)
+                    if isinstance(value, list):
+                        blob.extend(value)
+                        lengths.append(len(value))
+                    else:
+                        lengths.append(None)
+                out["$block"] = lengths
+                return out
+            return {key: extract(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [extract(item) for item in node]
+        return node
+
+    header = json.dumps({"fields": fields, "results": extract(results)}, ensure_ascii=False,
+                        separators=(',', ':')).encode('utf-8')
+    if struct.pack('=H', 1) != struct.pack('<H', 1):
+        blob.byteswap()
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(header)))
+        f.write(header)
+        f.write(blob.tobytes())
+
+
+def read_binary(path: str) -> Dict:
+    """读取二进制结果，还原为紧凑格式的字典"""
+    with open(path, 'rb') as f:
+        magic, version, header_len = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError(f"不支持的二进制预测结果: {magic!r} v{version}")
+        header = json.loads(f.read(header_len).decode('utf-8'))
+        blob = array('f')
+        blob.frombytes(f.read())
+    if struct.pack('=H', 1) != struct.pack('<H', 1):
+        blob.byteswap()
+
+    fields = header["fields"]
+    position = 0
+
+    def restore(node):
+        nonlocal position
+        if isinstance(node, dict):
+            out = {key: restore(value) for key, value in node.items() if key != "$block"}
+            for field, length in zip(fields, node.get("$block", ())):
+                if length is not None:
+                    out[field] = [round(v, 4) for v in blob[position:position + length]]
+                    position += length
+            return out
+        if isinstance(node, list):
+            return [restore(item) for item in node]
+        return node
+
+    return restore(header["results"])
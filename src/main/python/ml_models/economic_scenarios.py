@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+经济情景蒙特卡洛模拟
+以预测器的捕集率/甲醇产量预测为中心路径，在 (路径,) 批量数组上逐小时推进
+捕集率偏差、甲醇市场价、运营成本三个相关的AR(1)过程（Cholesky 相关冲击），
+价格/成本参数取自 CCUDataGenerator.economic_params，分时电价与 get_electricity_price 一致；
+按自然日、自然月（第 h 步对应 起始时间 + h 小时 所在的日期）在推进过程中累计收入/成本/利润，
+输出每日、每月和整个时段的分位数；内存为 O(路径数 × 天数)，与小时数无关。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# 复用数据生成器中的工艺/经济参数
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_generation'))
+from generate_mock_data import CCUDataGenerator  # noqa: E402
+
+DEFAULT_QUANTILES = (0.05, 0.5, 0.95)
+
+# 冲击相关系数：[捕集率, 甲醇价格, 运营成本]
+DEFAULT_CORRELATION = [
+    [1.0, 0.0, -0.2],
+    [0.0, 1.0, 0.3],
+    [-0.2, 0.3, 1.0]
+]
+
+# 各过程的小时级AR(1)系数（越接近1越持久）
+DEFAULT_PERSISTENCE = {"capture_rate": 0.9, "methanol_price": 0.98, "operational_cost": 0.95}
+
+
+class ScenarioEngine:
+    """收入/成本/利润情景模拟"""
+
+    def __init__(self, generator: Optional[CCUDataGenerator] = None, correlation: Sequence[Sequence[float]] = None,
+                 persistence: Optional[Dict] = None, power_kw: float = 0.0):
+        generator = generator or CCUDataGenerator()
+        self.generator = generator
+        self.params = generator.params
+        self.economic_params = generator.economic_params
+        self.correlation = np.asarray(correlation or DEFAULT_CORRELATION, dtype=float)
+        self.chol = np.linalg.cholesky(self.correlation)
+        self.persistence = {**DEFAULT_PERSISTENCE, **(persistence or {})}
+        # 可选的用电负荷（kW），按分时电价计入成本；生成器的利润口径中不含电费，默认0
+        self.power_kw = power_kw
+
+    def _range_stats(self, spec: Dict):
+        """均匀分布参数区间 -> (均值, 标准差)"""
+        return (spec['min'] + spec['max']) / 2, (spec['max'] - spec['min']) / np.sqrt(12)
+
+    def yield_from_capture(self, capture_rate):
+        """与生成器一致：甲醇产量随捕集率线性变化"""
+        cr, my = self.params['co2_capture_rate'], self.params['methanol_yield']
+        return my['min'] + (np.asarray(capture_rate) - cr['min']) / (cr['max'] - cr['min']) * (my['max'] - my['min'])
+
+    def central_path(self, horizon: int, forecasts: Optional[Dict[str, Sequence[float]]] = None) -> Dict:
+        """中心路径：优先使用预测值，超出预测长度时按最后24小时循环延伸"""
+        forecasts = forecasts or {}
+
+        def extend(values):
+            values = np.asarray(values, dtype=float)
+            if values.size >= horizon:
+                return values[:horizon]
+            cycle = values[-24:]
+            reps = int(np.ceil((horizon - values.size) / cycle.size))
+            return np.concatenate([values, np.tile(cycle, reps)])[:horizon]
+
+        cr_mean, _ = self._range_stats({'min': 85, 'max': 95})
+        capture = extend(forecasts['co2_capture_rate']) if forecasts.get('co2_capture_rate') else np.full(horizon, cr_mean)
+        if forecasts.get('methanol_yield'):
+            methanol = extend(forecasts['methanol_yield'])
+        else:
+            methanol = self.yield_from_capture(capture)
+        return {"co2_capture_rate": capture, "methanol_yield": methanol}
+
+    def _bucket_moments(self, phi: float, scale: float, steps: int):
+        """
+        新息标准差为 scale 的AR(1)从已知起点推进 steps 步：
+        返回 (起点对步内之和的系数, 起点对终点的系数, [[之和, 0], [终点, 终点]] 的Cholesky因子)
+        """
+        if steps == 0:
+            return 0.0, 1.0, (0.0, 0.0, 0.0)
+        lags = np.arange(steps)                       # 各新息距终点的步数 H - j
+        to_end = phi ** lags
+        to_sum = (1 - phi ** (lags + 1)) / (1 - phi) if phi != 1 else lags + 1.0
+        var_sum = scale ** 2 * float(to_sum @ to_sum)
+        var_end = scale ** 2 * float(to_end @ to_end)
+        cov = scale ** 2 * float(to_sum @ to_end)
+        l11 = np.sqrt(var_sum)
+        l21 = cov / l11 if l11 > 0 else 0.0
+        l22 = np.sqrt(max(var_end - l21 ** 2, 0.0))
+        return float(phi * (1 - phi ** steps) / (1 - phi)) if phi != 1 else float(steps), float(phi ** steps), \
+            (float(l11), float(l21), float(l22))
+
+    def simulate(self, horizon: int = 72, n_paths: int = 100_000, forecasts: Optional[Dict] = None,
+                 start_time: Optional[datetime] = None, quantiles: Sequence[float] = DEFAULT_QUANTILES,
+                 seed: Optional[int] = None, capture_sigma: float = 2.0) -> Dict:
+        """模拟 n_paths 条路径，返回每日、每月及全时段的收入/成本/利润分位数"""
+        started = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        start_time = start_time or datetime.now().replace(minute=0, second=0, microsecond=0)
+        central = self.central_path(horizon, forecasts)
+
+        price_mean, price_std = self._range_stats(self.economic_params['methanol_market_price'])
+        cost_mean, cost_std = self._range_stats(self.economic_params['operational_cost_hourly'])
+        cr_bounds = self.params['co2_capture_rate']
+        # 产量的特异噪声：生成器中为 ±1.5 的均匀分布
+        yield_noise_std = 3 / np.sqrt(12)
+        yield_slope = float(self.yield_from_capture(cr_bounds['min'] + 1) - self.yield_from_capture(cr_bounds['min']))
+
+        phi = np.array([self.persistence["capture_rate"], self.persistence["methanol_price"],
+                        self.persistence["operational_cost"]], dtype=np.float32)
+        # 平稳标准差 = 目标标准差，新息标准差 = sigma * sqrt(1 - phi^2)
+        sigma = np.array([capture_sigma, price_std, cost_std], dtype=np.float32)
+        innovation_scale = sigma * np.sqrt(1 - phi ** 2)
+        chol = self.chol.astype(np.float32)
+        # 运营成本只以桶内之和进入结果：与捕集率/价格相关的部分随逐小时冲击推进，
+        # 独立部分（chol[2, 2]）按桶精确抽样桶内之和与桶末状态，每小时只需2个正态数
+        mix = chol[:, :2] * innovation_scale[:, None]
+        cost_phi, cost_scale = float(phi[2]), float(innovation_scale[2] * chol[2, 2])
+        moments = {}
+
+        # 第 step 步是 start_time 之后第 step+1 个小时，按其所在的自然日、自然月分桶
+        step_times = [start_time + timedelta(hours=h + 1) for h in range(horizon)]
+        day_of_step = [(t.date() - step_times[0].date()).days for t in step_times]
+        month_of_step = [(t.year - step_times[0].year) * 12 + t.month - step_times[0].month for t in step_times]
+        n_days = day_of_step[-1] + 1 if horizon else 0
+        n_months = month_of_step[-1] + 1 if horizon else 0
+        revenue = np.empty((n_paths, n_days), dtype=np.float64)
+        cost = np.empty((n_paths, n_days), dtype=np.float64)
+        month_revenue = np.zeros((n_paths, n_months), dtype=np.float64)
+        month_cost = np.zeros((n_paths, n_months), dtype=np.float64)
+        central_capture = central["co2_capture_rate"].astype(np.float32)
+        central_methanol = central["methanol_yield"].astype(np.float32)
+        electricity = np.array([self.generator.get_electricity_price(t.hour) for t in step_times]) * self.power_kw
+
+        # 状态按 (过程, 路径) 存放，每个过程是连续内存；从平稳分布起步
+        z = rng.standard_normal((3, n_paths), dtype=np.float32)
+        state = (chol[:, :2] @ z[:2]) * sigma[:, None]
+        cost_independent = z[2] * (sigma[2] * chol[2, 2])
+        capture_dev, price_dev, cost_common = state
+        phi = phi[:, None]
+        shocks = np.empty_like(state)
+        day_revenue = np.zeros(n_paths, dtype=np.float32)
+        day_price = np.zeros(n_paths, dtype=np.float32)
+        day_cost_dev = np.zeros(n_paths, dtype=np.float32)
+        methanol = np.empty(n_paths, dtype=np.float32)
+        hourly = np.empty(n_paths, dtype=np.float32)
+        day_steps = []
+        month_steps = []
+        day_start = 0
+
+        for step in range(horizon):
+            if step:
+                rng.standard_normal(dtype=np.float32, out=z[:2])
+                np.matmul(mix, z[:2], out=shocks)
+                state *= phi
+                state += shocks
+
+            # 捕集率限制在工艺范围内，产量随捕集率偏差线性变化
+            np.clip(capture_dev, cr_bounds['min'] - central_capture[step], cr_bounds['max'] - central_capture[step],
+                    out=methanol)
+            methanol *= yield_slope
+            methanol += central_methanol[step]
+            np.maximum(methanol, 0, out=methanol)
+            np.add(price_dev, price_mean, out=hourly)
+            hourly *= methanol
+            day_revenue += hourly
+            day_price += price_dev
+            day_cost_dev += cost_common
+
+            if step == horizon - 1 or day_of_step[step + 1] != day_of_step[step]:
+                day, month = day_of_step[step], month_of_step[step]
+                hours = step - day_start + 1
+                day_steps.append((day_start, step))
+                # 成本独立部分：首个桶包含起点本身，之后的桶从上一桶末状态推进 hours 步
+                steps = hours - 1 if day_start == 0 else hours
+                if steps not in moments:
+                    moments[steps] = self._bucket_moments(cost_phi, cost_scale, steps)
+                to_sum, to_end, (l11, l21, l22) = moments[steps]
+                u = rng.standard_normal((2, n_paths), dtype=np.float32)
+                day_cost_dev += cost_independent * to_sum + u[0] * l11
+                if day_start == 0:
+                    day_cost_dev += cost_independent
+                cost_independent = cost_independent * to_end + u[0] * l21 + u[1] * l22
+
+                mean_price = day_price / hours + price_mean
+                # 产量的逐小时独立噪声按日聚合：日内价格变化缓慢，噪声收入 ≈ 日均价 × 噪声之和
+                noise = rng.standard_normal(n_paths, dtype=np.float32) * (yield_noise_std * np.sqrt(hours))
+                revenue[:, day] = day_revenue + noise * mean_price
+                cost[:, day] = day_cost_dev + (cost_mean * hours + electricity[day_start:step + 1].sum())
+                month_revenue[:, month] += revenue[:, day]
+                month_cost[:, month] += cost[:, day]
+                if month == len(month_steps):
+                    month_steps.append([day_start, step])
+                month_steps[month][1] = step
+                day_revenue[:] = 0
+                day_price[:] = 0
+                day_cost_dev[:] = 0
+                day_start = step + 1
+
+        qs = np.asarray(quantiles)
+
+        def summarize(values: np.ndarray) -> Dict:
+            bands = np.quantile(values, qs, axis=0)
+            return {f"p{round(q * 100)}": round(float(v), 2) for q, v in zip(qs, bands)}
+
+        def bucket(first: int, last: int, bucket_revenue: np.ndarray, bucket_cost: np.ndarray) -> Dict:
+            return {
+                "start": step_times[first].isoformat(),
+                "end": step_times[last].isoformat(),
+                "hours": last - first + 1,
+                "revenue": summarize(bucket_revenue),
+                "cost": summarize(bucket_cost),
+                "profit": summarize(bucket_revenue - bucket_cost)
+            }
+
+        daily = [{"date": step_times[first].date().isoformat(), **bucket(first, last, revenue[:, d], cost[:, d])}
+                 for d, (first, last) in enumerate(day_steps)]
+        monthly = [{"month": step_times[first].strftime('%Y-%m'),
+                    **bucket(first, last, month_revenue[:, m], month_cost[:, m])}
+                   for m, (first, last) in enumerate(month_steps)]
+        total_revenue, total_cost = month_revenue.sum(axis=1), month_cost.sum(axis=1)
+        total_profit = total_revenue - total_cost
+        return {
+            "paths": n_paths,
+            "horizon_hours": horizon,
+            "start_time": start_time.isoformat(),
+            "daily": daily,
+            "monthly": monthly,
+            "total": {
+                "revenue": summarize(total_revenue),
+                "cost": summarize(total_cost),
+                "profit": summarize(total_profit),
+                "expected_profit": round(float(total_profit.mean()), 2),
+                "loss_probability": round(float((total_profit < 0).mean()), 4)
+            },
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+
+
+def forecasts_from_results(results: Dict) -> Dict[str, List[float]]:
+    """从 advanced_predictor 的输出（verbose 或 compact）中取各指标的预测值"""
+    forecasts = {}
+    for metric, result in results.get("prediction_results", {}).items():
+        predictions = result.get("predictions") if isinstance(result, dict) else None
+        if isinstance(predictions, dict):
+            forecasts[metric] = predictions.get("values", [])
+        elif isinstance(predictions, list):
+            forecasts[metric] = [p["predicted_value"] for p in predictions]
+    return forecasts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CCU经济情景蒙特卡洛模拟')
+    parser.add_argument('--predictions', type=str, help='advanced_predictor 的预测结果文件（作为中心路径）')
+    parser.add_argument('--output', type=str, default='./scenarios.json', help='模拟结果输出文件')
+    parser.add_argument('--horizon', type=int, default=72, help='模拟时长（小时），720约为一个月')
+    parser.add_argument('--paths', type=int, default=100_000, help='模拟路径数')
+    parser.add_argument('--power-kw', type=float, default=0.0, help='按分时电价计费的用电负荷（kW）')
+    parser.add_argument('--seed', type=int, help='随机种子')
+
+    args = parser.parse_args()
+
+    try:
+        forecasts, start_time = {}, None
+        if args.predictions:
+            with open(args.predictions, 'r', encoding='utf-8') as f:
+                results = json.load(f)
+            forecasts = forecasts_from_results(results)
+            base_times = [r.get("base_time") for r in results.get("prediction_results", {}).values()
+                          if isinstance(r, dict) and r.get("base_time")]
+            if base_times:
+                start_time = datetime.fromisoformat(base_times[0])
+            print(f"中心路径: {', '.join(forecasts) or '参数区间中值'}")
+
+        engine = ScenarioEngine(power_kw=args.power_kw)
+        result = engine.simulate(args.horizon, args.paths, forecasts, start_time, seed=args.seed)
+
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+        total = result["total"]
+        print(f"模拟完成: {result['paths']} 条路径 × {result['horizon_hours']} 小时，耗时 {result['elapsed_ms']} ms")
+        print(f"总利润 P5/P50/P95: {total['profit']['p5']} / {total['profit']['p50']} / {total['profit']['p95']}")
+        print(f"亏损概率: {total['loss_probability'] * 100:.2f}%")
+        for month in result["monthly"]:
+            profit = month["profit"]
+            print(f"  {month['month']}（{month['hours']} 小时）利润 P5/P50/P95: "
+                  f"{profit['p5']} / {profit['p50']} / {profit['p95']}")
+        print(f"结果已保存到: {args.output}")
+
+    except Exception as e:
+        print(f"模拟失败: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
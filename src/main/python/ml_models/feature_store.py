@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滞后/滚动/日历特征库
+一次扫描历史记录，得到所有数值指标的列和时间戳；
+滞后矩阵是 sliding_window_view 的零拷贝视图，滚动均值/标准差由前缀和得到，
+小时/星期编码；分时电价段和电价直接由 CCUDataGenerator 的电价参数和 get_electricity_price 得到。
+特征按已加载的数据集对象缓存，同一数据集上的所有模型、所有指标共享。
+"""
+
+import os
+import sys
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 复用数据生成器中的分时电价
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_generation'))
+from generate_mock_data import CCUDataGenerator  # noqa: E402
+
+# 分时电价段：0=谷时 1=平时 2=峰时
+TOU_BANDS = ('valley', 'normal', 'peak')
+_TARIFF = CCUDataGenerator()
+TOU_PRICES = np.array([_TARIFF.economic_params['electricity_price'][band] for band in TOU_BANDS])
+# 每个小时（0-23）所在的电价段
+HOUR_BANDS = np.array([TOU_PRICES.tolist().index(_TARIFF.get_electricity_price(hour)) for hour in range(24)])
+
+# 最多缓存的数据集数
+MAX_CACHED_DATASETS = 4
+
+# id(数据集) -> (数据集, 记录数, 特征库)；持有数据集引用，保证 id 在缓存期间不被复用
+_STORES: "OrderedDict[int, tuple]" = OrderedDict()
+
+
+def tou_band(hours: np.ndarray) -> np.ndarray:
+    """小时 -> 分时电价段"""
+    return HOUR_BANDS[np.asarray(hours, dtype=np.int64) % 24]
+
+
+def tou_price(hours: np.ndarray) -> np.ndarray:
+    """小时 -> 分时电价（元/kWh）"""
+    return TOU_PRICES[tou_band(hours)]
+
+
+class Calendar:
+    """逐条记录的日历特征"""
+
+    def __init__(self, hours: np.ndarray, dows: np.ndarray):
+        self.hour = hours
+        self.dow = dows
+        self.hour_sin = np.sin(2 * np.pi * hours / 24)
+        self.hour_cos = np.cos(2 * np.pi * hours / 24)
+        self.tou_band = tou_band(hours)
+        self.tou_price = TOU_PRICES[self.tou_band]
+
+    @classmethod
+    def from_timestamps(cls, timestamps: Optional[Sequence[datetime]], n: int) -> "Calendar":
+        """由时间戳构建；无时间戳时按逐小时序列推算"""
+        if timestamps is not None and len(timestamps) == n:
+            hours = np.fromiter((t.hour for t in timestamps), dtype=np.int64, count=n)
+            dows = np.fromiter((t.weekday() for t in timestamps), dtype=np.int64, count=n)
+        else:
+            hours = np.arange(n) % 24
+            dows = (np.arange(n) // 24) % 7
+        return cls(hours, dows)
+
+    def subset(self, mask: np.ndarray) -> "Calendar":
+        return Calendar(self.hour[mask], self.dow[mask])
+
+
+class SeriesFeatures:
+    """单条序列的滞后矩阵和滚动统计，按参数惰性计算并缓存"""
+
+    def __init__(self, values, calendar: Calendar):
+        if isinstance(values, np.ndarray):
+            self.y = values.astype(float, copy=False)
+        else:
+            try:
+                # array('d') 等缓冲区对象零拷贝
+                self.y = np.frombuffer(values, dtype=float)
+            except (TypeError, ValueError):
+                self.y = np.asarray(values, dtype=float)
+        self.calendar = calendar
+        self._cache = {}
+        self._csum = None
+        self._csum2 = None
+
+    @classmethod
+    def from_values(cls, values, timestamps: Optional[Sequence[datetime]] = None) -> "SeriesFeatures":
+        return cls(values, Calendar.from_timestamps(timestamps, len(values)))
+
+    def __len__(self):
+        return self.y.size
+
+    def _prefix_sums(self):
+        if self._csum is None:
+            self._csum = np.concatenate(([0.0], np.cumsum(self.y)))
+            self._csum2 = np.concatenate(([0.0], np.cumsum(self.y * self.y)))
+        return self._csum, self._csum2
+
+    def lag_matrix(self, n_lags: int) -> np.ndarray:
+        """
+        零拷贝滞后矩阵视图：第 i 行对应以 i + n_lags - 1 为最新观测点，
+        第 k 列为 lag(k+1)，即 y[i + n_lags - 1 - k]
+        """
+        key = ("lags", n_lags)
+        if key not in self._cache:
+            self._cache[key] = sliding_window_view(self.y, n_lags)[:, ::-1]
+        return self._cache[key]
+
+    def lags_at(self, origins: np.ndarray, lags: Sequence[int]) -> np.ndarray:
+        """在指定原点处取若干滞后列"""
+        max_lag = max(lags)
+        matrix = self.lag_matrix(max_lag)
+        return matrix[np.asarray(origins) - max_lag + 1][:, [lag - 1 for lag in lags]]
+
+    def rolling_mean(self, window: int) -> np.ndarray:
+        """以每个点为窗口末端的滚动均值，前 window-1 个点为NaN"""
+        key = ("mean", window)
+        if key not in self._cache:
+            csum, _ = self._prefix_sums()
+            out = np.full(self.y.size, np.nan)
+            if self.y.size >= window:
+                out[window - 1:] = (csum[window:] - csum[:-window]) / window
+            self._cache[key] = out
+        return self._cache[key]
+
+    def rolling_std(self, window: int) -> np.ndarray:
+        """以每个点为窗口末端的滚动总体标准差"""
+        key = ("std", window)
+        if key not in self._cache:
+            _, csum2 = self._prefix_sums()
+            mean = self.rolling_mean(window)
+            out = np.full(self.y.size, np.nan)
+            if self.y.size >= window:
+                sq = (csum2[window:] - csum2[:-window]) / window
+                out[window - 1:] = np.sqrt(np.maximum(sq - mean[window - 1:] ** 2, 0.0))
+            self._cache[key] = out
+        return self._cache[key]
+
+
+class FeatureStore:
+    """数据集级特征库：一次扫描提取所有数值指标，日历特征全体共享"""
+
+    def __init__(self, data: List[Dict]):
+        timestamps = []
+        columns: Dict[str, List[float]] = {}
+
+        # 单遍扫描：解析时间戳，同时收集所有数值字段
+        for record in data:
+            try:
+                timestamp = datetime.fromisoformat(record['timestamp'].replace('Z', '+00:00'))
+            except (KeyError, ValueError, AttributeError):
+                continue
+            row = len(timestamps)
+            timestamps.append(timestamp)
+            for field, value in record.items():
+                if field == 'timestamp':
+                    continue
+                # 与逐指标提取一致：能用 float() 转换的值（包括数字字符串）都作为数值
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    continue
+                column = columns.get(field)
+                if column is None:
+                    column = columns[field] = [float('nan')] * row
+                column.append(value)
+            for column in columns.values():
+                if len(column) <= row:
+                    column.append(float('nan'))
+
+        self.timestamps = timestamps
+        self.calendar = Calendar.from_timestamps(timestamps, len(timestamps))
+        self.columns = {field: np.array(column) for field, column in columns.items()}
+        self._series: Dict = {}
+
+    @property
+    def metrics(self) -> List[str]:
+        return list(self.columns)
+
+    def series(self, metric: str):
+        """返回 (时间戳列表, 数值数组)，跳过该指标缺失的记录"""
+        column = self.columns.get(metric)
+        if column is None:
+            return [], np.empty(0)
+        mask = ~np.isnan(column)
+        if mask.all():
+            return self.timestamps, column
+        return [t for t, keep in zip(self.timestamps, mask) if keep], column[mask]
+
+    def features(self, key, values=None) -> SeriesFeatures:
+        """
+        指标（或其派生序列，如过滤后的序列）的特征，按 key 缓存
+        key 为指标名时直接取原始列；派生序列需传入 values，key 通常为 (指标, 预处理参数)
+        """
+        if key not in self._series:
+            metric = key[0] if isinstance(key, tuple) else key
+            column = self.columns.get(metric)
+            mask = ~np.isnan(column) if column is not None else None
+            calendar = self.calendar if mask is None or mask.all() else self.calendar.subset(mask)
+            if values is None:
+                values = column[mask] if mask is not None else np.empty(0)
+            self._series[key] = SeriesFeatures(values, calendar)
+        return self._series[key]
+
+
+def get_feature_store(data: List[Dict]) -> FeatureStore:
+    """
+    返回数据集对应的特征库；以已加载的数据集对象本身为键（内容相同但分别加载的数据集不共享），
+    数据集被追加/截断（记录数变化）时重建
+    """
+    key = id(data)
+    entry = _STORES.get(key)
+    if entry is not None and entry[0] is data and entry[1] == len(data):
+        _STORES.move_to_end(key)
+        return entry[2]
+    store = FeatureStore(data)
+    _STORES[key] = (data, len(data), store)
+    _STORES.move_to_end(key)
+    while len(_STORES) > MAX_CACHED_DATASETS:
+        _STORES.popitem(last=False)
+    return store
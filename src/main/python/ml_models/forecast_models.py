@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可插拔的基础预测模型注册表
+每个模型针对一条序列只计算一次，通过 forecast(horizon) 输出多步预测；
+同一序列上的模型共享 SeriesCache 中的中间结果（窗口均值、平滑水平、回归统计量等）。
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from hyperparameter_tuning import DEFAULT_PARAMS
+
+MODEL_REGISTRY: Dict[str, type] = {}
+
+
+def register_model(name: str):
+    """注册预测模型类"""
+    def decorator(cls):
+        cls.name = name
+        MODEL_REGISTRY[name] = cls
+        return cls
+    return decorator
+
+
+def create_model(name: str, cache: "SeriesCache", **params) -> "BaseForecaster":
+    """按名称创建模型实例"""
+    if name not in MODEL_REGISTRY:
+        raise ValueError(f"未注册的预测模型: {name}")
+    return MODEL_REGISTRY[name](cache, **params)
+
+
+class SeriesCache:
+    """单条序列的特征/状态缓存，供同一序列上的多个模型复用"""
+
+    def __init__(self, values: Sequence[float], timestamps: Optional[Sequence] = None, features=None):
+        self.values = values
+        self.timestamps = timestamps
+        # 特征库中该序列的 SeriesFeatures（可选），提供向量化的滚动统计和滞后矩阵
+        self.features = features
+        self._cache = {}
+
+    def get(self, key, compute: Callable):
+        """按键取缓存，未命中时调用 compute() 计算并缓存"""
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def window_mean(self, window: int) -> float:
+        """最近 window 个点的均值"""
+        def compute():
+            if self.features is not None and len(self.features) >= window:
+                return float(self.features.rolling_mean(window)[-1])
+            recent = self.values[-window:]
+            return sum(recent) / len(recent)
+        return self.get(("window_mean", window), compute)
+
+    def smoothing_state(self, alpha: float) -> Dict:
+        """指数平滑的最终水平和全序列平均绝对误差（每个值相对折叠它之前的水平，即一步预测误差）"""
+        def compute():
+            values = self.values
+            smoothed = values[0]
+            abs_dev_sum = 0.0
+            for value in values[1:]:
+                abs_dev_sum += abs(value - smoothed)
+                smoothed = alpha * value + (1 - alpha) * smoothed
+            errors = len(values) - 1
+            mean_error = abs_dev_sum / errors if errors else 0
+            return {"level": smoothed, "mean_error": mean_error}
+        return self.get(("smoothing", alpha), compute)
+
+    def weighted_regression(self, max_window: int = 72) -> Dict:
+        """近期加权最小二乘回归：斜率、截距和拟合质量"""
+        def compute():
+            n = min(max_window, len(self.values))
+            y = self.values[-n:]
+            sum_w = sum_wx = sum_wy = sum_wxy = sum_wx2 = 0.0
+            for i, yi in enumerate(y):
+                # 距离现在越近，权重越大
+                w = (i + 1) / n
+                sum_w += w
+                sum_wx += w * i
+                sum_wy += w * yi
+                sum_wxy += w * i * yi
+                sum_wx2 += w * i * i
+
+            denominator = sum_w * sum_wx2 - sum_wx * sum_wx
+            if abs(denominator) < 1e-10:
+                # 避免除零错误，使用简单平均
+                slope = 0
+                intercept = sum_wy / sum_w
+            else:
+                slope = (sum_w * sum_wxy - sum_wx * sum_wy) / denominator
+                intercept = (sum_wy - slope * sum_wx) / sum_w
+
+            mse = sum((yi - (slope * i + intercept)) ** 2 for i, yi in enumerate(y)) / n
+            fit_quality = max(0, 1 - mse / (sum(yi ** 2 for yi in y) / n))
+            return {"slope": slope, "intercept": intercept, "n": n, "fit_quality": fit_quality}
+        return self.get(("regression", max_window), compute)
+
+
+class BaseForecaster:
+    """预测模型基类"""
+    name = ""
+
+    def __init__(self, cache: SeriesCache, **params):
+        self.cache = cache
+        self.params = params
+
+    @property
+    def values(self) -> Sequence[float]:
+        return self.cache.values
+
+    def forecast(self, horizon: int) -> Tuple[List[float], List[float]]:
+        """返回 (预测值列表, 置信度列表)"""
+        raise NotImplementedError
+
+
+@register_model("linear")
+class LinearTrendForecaster(BaseForecaster):
+    """改进的线性回归预测"""
+
+    def forecast(self, horizon: int) -> Tuple[List[float], List[float]]:
+        values = self.values
+        if len(values) < 2:
+            base_value = values[0] if values else 87.5
+            return [base_value] * horizon, [0.7] * horizon
+
+        reg = self.cache.weighted_regression(self.params.get("max_window", 72))
+        slope, intercept, n = reg["slope"], reg["intercept"], reg["n"]
+        # 趋势稳定性
+        trend_stability = max(0.8, 1 - abs(slope) * 0.1)
+
+        predictions = []
+        confidences = []
+        for i in range(1, horizon + 1):
+            predictions.append(slope * (n + i - 1) + intercept)
+            # 动态置信度：拟合质量 × 趋势稳定性，每小时衰减1.5%
+            confidence = 0.92 * reg["fit_quality"] * trend_stability - 0.015 * i
+            confidences.append(max(0.55, min(0.95, confidence)))
+
+        return predictions, confidences
+
+
+@register_model("exponential")
+class ExponentialSmoothingForecaster(BaseForecaster):
+    """指数平滑预测，多步时简单延续趋势"""
+
+    def one_step(self) -> Tuple[float, float]:
+        values = self.values
+        alpha = self.params.get("alpha", DEFAULT_PARAMS["alpha"])
+        if not values:
+            return 0.0, 0.6
+        if len(values) == 1:
+            return values[0], 0.7
+
+        state = self.cache.smoothing_state(alpha)
+        # 估计趋势
+        trend = 0.0
+        if len(values) >= 3:
+            trend = alpha * (values[-1] - values[-3]) / 2
+        prediction = state["level"] + trend
+
+        confidence = max(0.65, 1.0 - state["mean_error"] / abs(prediction) if prediction != 0 else 0.8)
+        return prediction, min(0.95, confidence)
+
+    def forecast(self, horizon: int) -> Tuple[List[float], List[float]]:
+        pred, conf = self.one_step()
+        preds, confs = [pred], [conf]
+        last = self.values[-1] if self.values else 0.0
+        for _ in range(1, horizon):
+            trend = preds[-1] - last
+            preds.append(preds[-1] + trend * 0.5)
+            confs.append(confs[-1] * 0.95)
+        return preds[:horizon], confs[:horizon]
+
+
+@register_model("recursive_exponential")
+class RecursiveExponentialForecaster(BaseForecaster):
+    """递归指数平滑：每步把预测值追加到序列末尾后再做一步预测"""
+
+    def forecast(self, horizon: int) -> Tuple[List[float], List[float]]:
+        alpha = self.params.get("alpha", DEFAULT_PARAMS["alpha"])
+        current_values = list(self.values)
+        predictions = []
+        confidences = []
+        for _ in range(horizon):
+            pred, conf = ExponentialSmoothingForecaster(SeriesCache(current_values), alpha=alpha).one_step()
+            predictions.append(pred)
+            confidences.append(conf)
+            current_values.append(pred)
+        return predictions, confidences
+
+
+@register_model("moving_average")
+class MovingAverageForecaster(BaseForecaster):
+    """多窗口移动平均预测，窗口越短权重越大"""
+
+    def one_step(self) -> Tuple[float, float]:
+        values = self.values
+        window_sizes = self.params.get("window_sizes", DEFAULT_PARAMS["window_sizes"])
+        if not values:
+            return 0.0, 0.6
+
+        predictions = []
+        weights = []
+        for window in window_sizes:
+            if len(values) >= window:
+                predictions.append(self.cache.window_mean(window))
+                weights.append(1.0 / window)
+
+        if not predictions:
+            return values[-1], 0.7
+
+        total_weight = sum(weights)
+        weighted_prediction = sum(p * w for p, w in zip(predictions, weights)) / total_weight
+
+        variance = sum((p - weighted_prediction) ** 2 for p in predictions) / len(predictions)
+        confidence = max(0.6, 1.0 - variance / (weighted_prediction ** 2) if weighted_prediction != 0 else 0.8)
+        return weighted_prediction, min(0.98, confidence)
+
+    def forecast(self, horizon: int) -> Tuple[List[float], List[float]]:
+        pred, conf = self.one_step()
+        # 递减置信度
+        return [pred] * horizon, [conf * (0.98 ** step) for step in range(horizon)]
+
+
+@register_model("ensemble")
+class EnsembleForecaster(BaseForecaster):
+    """加权集成：每个成员模型只计算一次，按权重逐步合成"""
+
+    def members(self) -> List[Tuple[str, float, Dict]]:
+        params = self.params.get("config") or DEFAULT_PARAMS
+        w_linear, w_exp, w_ma = params["weights"]
+        return [
+            ("linear", w_linear, {}),
+            ("exponential", w_exp, {"alpha": params["alpha"]}),
+            ("moving_average", w_ma, {"window_sizes": params["window_sizes"]})
+        ]
+
+    def forecast(self, horizon: int) -> Tuple[List[float], List[float]]:
+        outputs = []
+        for name, weight, params in self.members():
+            preds, confs = create_model(name, self.cache, **params).forecast(horizon)
+            outputs.append((preds, confs, weight))
+
+        final_predictions = []
+        final_confidences = []
+        for step in range(horizon):
+            weighted_pred = 0
+            weighted_conf = 0
+            total_weight = 0
+            for preds, confs, weight in outputs:
+                if step < len(preds):
+                    weighted_pred += preds[step] * weight
+                    weighted_conf += confs[step] * weight
+                    total_weight += weight
+
+            if total_weight > 0:
+                final_predictions.append(weighted_pred / total_weight)
+                final_confidences.append(min(0.96, weighted_conf / total_weight))
+            else:
+                final_predictions.append(self.values[-1] if self.values else 87.5)
+                final_confidences.append(0.7)
+
+        return final_predictions, final_confidences
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+集成模型超参数搜索
+按指标在留出回测上搜索指数平滑系数、移动平均窗口组合和集成权重。
+前缀和、各平滑系数的平滑状态和回归统计量只计算一次，由所有候选共享，
+候选配置分块交给进程池并行评估。
+"""
+
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CONFIG_VERSION = 1
+
+DEFAULT_PARAMS = {
+    "alpha": 0.3,
+    "window_sizes": [12, 24, 48],
+    "weights": [0.4, 0.3, 0.3]
+}
+
+ALPHA_GRID = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+WINDOW_GRID = [[6, 12, 24], [12, 24, 48], [24, 48, 96], [6, 24], [12, 48], [24], [48]]
+WEIGHT_STEP = 0.1
+
+
+def weight_grid(step: float = WEIGHT_STEP) -> List[Tuple[float, float, float]]:
+    """三个基模型权重的单纯形网格（权重和为1）"""
+    n = int(round(1 / step))
+    grid = []
+    for i in range(n + 1):
+        for j in range(n + 1 - i):
+            grid.append((round(i * step, 4), round(j * step, 4), round((n - i - j) * step, 4)))
+    return grid
+
+
+class BacktestPrecomputation:
+    """回测共享的预计算结果，所有候选配置复用"""
+
+    def __init__(self, values: Sequence[float], origins: List[int], horizon: int,
+                 alphas: Sequence[float], regression_window: int = 72):
+        self.values = list(values)
+        self.origins = origins
+        self.horizon = horizon
+
+        # 前缀和：任意原点、任意窗口的均值 O(1)
+        prefix = [0.0]
+        for v in self.values:
+            prefix.append(prefix[-1] + v)
+        self.prefix = prefix
+
+        # 各平滑系数在每个回测原点处的平滑水平，每个alpha只扫描一遍序列
+        self.levels = {alpha: self._smoothed_levels(alpha) for alpha in alphas}
+
+        # 每个原点的加权回归外推（与超参数无关，只算一次）
+        self.regression = [self._regression_forecast(origin, regression_window) for origin in origins]
+
+        self.actuals = [self.values[origin:origin + horizon] for origin in origins]
+
+    def _smoothed_levels(self, alpha: float) -> List[float]:
+        wanted = set(self.origins)
+        levels = {}
+        smoothed = self.values[0]
+        for i in range(1, max(self.origins)):
+            smoothed = alpha * self.values[i] + (1 - alpha) * smoothed
+            if i + 1 in wanted:
+                levels[i + 1] = smoothed
+        return [levels.get(origin, self.values[0]) for origin in self.origins]
+
+    def _regression_forecast(self, origin: int, max_window: int) -> List[float]:
+        n = min(max_window, origin)
+        offset = origin - n
+        sum_w = sum_wx = sum_wy = sum_wxy = sum_wx2 = 0.0
+        for i in range(n):
+            w = (i + 1) / n
+            y = self.values[offset + i]
+            sum_w += w
+            sum_wx += w * i
+            sum_wy += w * y
+            sum_wxy += w * i * y
+            sum_wx2 += w * i * i
+        denominator = sum_w * sum_wx2 - sum_wx * sum_wx
+        if abs(denominator) < 1e-10:
+            slope, intercept = 0.0, sum_wy / sum_w
+        else:
+            slope = (sum_w * sum_wxy - sum_wx * sum_wy) / denominator
+            intercept = (sum_wy - slope * sum_wx) / sum_w
+        return [slope * (n + i - 1) + intercept for i in range(1, self.horizon + 1)]
+
+    def window_mean(self, origin: int, window: int) -> float:
+        return (self.prefix[origin] - self.prefix[origin - window]) / window
+
+
+def evaluate_candidate(pre: BacktestPrecomputation, alpha: float, window_sizes: Sequence[int],
+                       weights: Sequence[float]) -> float:
+    """在所有回测原点上计算候选配置的平均绝对误差"""
+    w_lin, w_exp, w_ma = weights
+    total_weight = w_lin + w_exp + w_ma
+    abs_error = 0.0
+    count = 0
+
+    for k, origin in enumerate(pre.origins):
+        values = pre.values
+        last = values[origin - 1]
+
+        # 指数平滑：水平 + 阻尼趋势，与 ensemble_prediction 的延续方式一致
+        exp_pred = pre.levels[alpha][k]
+        if origin >= 3:
+            exp_pred += alpha * (last - values[origin - 3]) / 2
+
+        # 多窗口移动平均
+        usable = [w for w in window_sizes if origin >= w]
+        if usable:
+            inv = [1.0 / w for w in usable]
+            ma_pred = sum(pre.window_mean(origin, w) * iw for w, iw in zip(usable, inv)) / sum(inv)
+        else:
+            ma_pred = last
+
+        regression = pre.regression[k]
+        for step, actual in enumerate(pre.actuals[k]):
+            pred = (regression[step] * w_lin + exp_pred * w_exp + ma_pred * w_ma) / total_weight
+            abs_error += abs(pred - actual)
+            count += 1
+            exp_pred = exp_pred + (exp_pred - last) * 0.5
+
+    return abs_error / count if count else float('inf')
+
+
+# 进程池工作进程持有的共享预计算结果（通过initializer注入一次）
+_WORKER_PRE: Optional[BacktestPrecomputation] = None
+
+
+def _init_worker(pre: BacktestPrecomputation):
+    global _WORKER_PRE
+    _WORKER_PRE = pre
+
+
+def _evaluate_chunk(candidates: List[Tuple]) -> Tuple[float, Tuple]:
+    best = (float('inf'), None)
+    for alpha, window_sizes, weights in candidates:
+        score = evaluate_candidate(_WORKER_PRE, alpha, window_sizes, weights)
+        if score < best[0]:
+            best = (score, (alpha, window_sizes, weights))
+    return best
+
+
+def backtest_origins(n: int, horizon: int, n_origins: int, min_history: int,
+                     stride: Optional[int] = None) -> List[int]:
+    """留出区间内的滚动回测原点（原点之后的horizon个点作为真实值），默认间隔半个预测时长"""
+    last_origin = n - horizon
+    stride = stride or max(1, horizon // 2)
+    origins = [last_origin - k * stride for k in range(n_origins)]
+    return sorted(o for o in origins if o >= min_history)
+
+
+def tune_series(values: Sequence[float], horizon: int = 24, n_origins: int = 8,
+                workers: Optional[int] = None, alphas: Sequence[float] = ALPHA_GRID,
+                window_grid: Sequence[Sequence[int]] = WINDOW_GRID,
+                weights: Optional[Sequence[Tuple[float, float, float]]] = None) -> Optional[Dict]:
+    """搜索单个指标的最优集成配置，数据不足时返回None"""
+    origins = backtest_origins(len(values), horizon, n_origins, min_history=max(map(max, window_grid)))
+    if not origins:
+        return None
+
+    pre = BacktestPrecomputation(values, origins, horizon, alphas)
+    candidates = list(itertools.product(alphas, [list(w) for w in window_grid], weights or weight_grid()))
+    baseline = evaluate_candidate(pre, DEFAULT_PARAMS["alpha"], DEFAULT_PARAMS["window_sizes"],
+                                  DEFAULT_PARAMS["weights"]) if DEFAULT_PARAMS["alpha"] in pre.levels else None
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        _init_worker(pre)
+        results = [_evaluate_chunk(candidates)]
+    else:
+        chunk_size = max(1, len(candidates) // (workers * 4))
+        chunks = [candidates[i:i + chunk_size] for i in range(0, len(candidates), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pre,)) as pool:
+            results = list(pool.map(_evaluate_chunk, chunks))
+
+    score, best = min(results, key=lambda r: r[0])
+    if best is None:
+        return None
+    alpha, window_sizes, best_weights = best
+    return {
+        "alpha": alpha,
+        "window_sizes": window_sizes,
+        "weights": list(best_weights),
+        "backtest_mae": round(score, 6),
+        "baseline_mae": round(baseline, 6) if baseline is not None else None,
+        "backtest_origins": len(origins),
+        "candidates_evaluated": len(candidates)
+    }
+
+
+def save_config(config: Dict[str, Dict], path: str, horizon: int):
+    """保存调优结果，供预测服务加载"""
+    payload = {
+        "version": CONFIG_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "horizon_hours": horizon,
+        "metrics": config
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def load_config(path: str) -> Dict[str, Dict]:
+    """加载调优结果，返回 {指标: 参数}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    if payload.get("version") != CONFIG_VERSION:
+        raise ValueError(f"不支持的配置版本: {payload.get('version')}")
+    return {
+        metric: {key: params[key] for key in DEFAULT_PARAMS}
+        for metric, params in payload.get("metrics", {}).items()
+    }
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+已拟合模型状态的持久化（热启动推理）
+fit 阶段对每个指标单遍扫描历史，保存异常值过滤器窗口、平滑水平、近期尾部窗口（回归/移动平均所需）
+和季节性相位统计；predict 阶段加载状态，只增量折叠新于状态的记录，再从状态直接预测。
+状态以带版本号的 gzip 压缩 JSON 保存。
+"""
+
+import gzip
+import json
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from forecast_models import SeriesCache
+from ring_buffer import RingBuffer
+from streaming_filter import create_filter, restore_filter
+
+ARTIFACT_FORMAT = "ccu-model-state"
+ARTIFACT_VERSION = 1
+
+# 尾部窗口长度：覆盖回归(72)、移动平均(最长96)和近期平均(24)所需的数据
+TAIL_SIZE = 168
+
+SEASONAL_PERIOD = 24
+
+# 支持热启动的模型（只依赖上述状态量的模型）
+WARM_START_MODELS = ["arima", "linear", "ensemble"]
+
+
+class MetricState:
+    """单个指标的已拟合状态，可逐条折叠新记录"""
+
+    def __init__(self, metric: str, alpha: float, outlier_filter=None, capacity: int = TAIL_SIZE):
+        self.metric = metric
+        self.alpha = alpha
+        self.filter = outlier_filter
+        # 尾部窗口为定长环形缓冲区，状态内存与已折叠的记录数无关
+        self.tail = RingBuffer(capacity)
+        self.count = 0
+        self.last_timestamp: Optional[datetime] = None
+        # 指数平滑水平，以及 |值 - 折叠该值之前的水平| 的累计和（用于平均误差），冷启动与增量折叠口径相同
+        self.level = 0.0
+        self.abs_dev_sum = 0.0
+        # 季节性相位：去趋势值的累计和与计数
+        self.seasonal_sums = [0.0] * SEASONAL_PERIOD
+        self.seasonal_counts = [0] * SEASONAL_PERIOD
+
+    @classmethod
+    def fit(cls, metric: str, timestamps: Sequence[datetime], values: Sequence[float], alpha: float,
+            outlier_filter: str, outlier_window: int, decompose, capacity: int = TAIL_SIZE) -> "MetricState":
+        """单遍过滤并拟合；fit 之后立即预测与冷启动完全一致"""
+        state = cls(metric, alpha, create_filter(outlier_filter, outlier_window), capacity)
+        filtered = array('d', state.filter.filter(values)) if state.filter else array('d', values)
+
+        smoothed = filtered[0]
+        for value in filtered[1:]:
+            state.abs_dev_sum += abs(value - smoothed)
+            smoothed = alpha * value + (1 - alpha) * smoothed
+        state.level = smoothed
+
+        if len(filtered) >= SEASONAL_PERIOD * 2:
+            decomp = decompose(filtered)
+            for i, (value, trend) in enumerate(zip(filtered, decomp["trend"])):
+                state.seasonal_sums[i % SEASONAL_PERIOD] += value - trend
+                state.seasonal_counts[i % SEASONAL_PERIOD] += 1
+
+        state.tail.extend(filtered[-capacity:])
+        state.count = len(filtered)
+        state.last_timestamp = timestamps[-1] if timestamps else None
+        return state
+
+    def update(self, timestamp: datetime, raw_value: float):
+        """折叠一条新记录（增量，O(窗口)）"""
+        value = self.filter.update(raw_value) if self.filter else raw_value
+        if self.count == 0:
+            self.level = value
+        else:
+            self.abs_dev_sum += abs(value - self.level)
+            self.level = self.alpha * value + (1 - self.alpha) * self.level
+
+        # 季节性：以尾部滚动均值近似趋势
+        if self.count >= SEASONAL_PERIOD:
+            recent = self.tail[-SEASONAL_PERIOD:]
+            phase = self.count % SEASONAL_PERIOD
+            self.seasonal_sums[phase] += value - sum(recent) / len(recent)
+            self.seasonal_counts[phase] += 1
+
+        self.tail.append(value)
+        self.count += 1
+        self.last_timestamp = timestamp
+
+    def seasonal_strength(self) -> float:
+        """与 seasonal_decomposition 一致：季节分量绝对值的全序列平均"""
+        total = sum(self.seasonal_counts)
+        if total == 0:
+            return 0.0
+        return sum(abs(s / c) * c for s, c in zip(self.seasonal_sums, self.seasonal_counts) if c) / total
+
+    def to_cache(self) -> SeriesCache:
+        """构建预填充了状态量的序列缓存，供注册表中的模型直接使用"""
+        cache = SeriesCache(self.tail)
+        mean_error = self.abs_dev_sum / (self.count - 1) if self.count > 1 else 0
+        cache.get(("smoothing", self.alpha), lambda: {"level": self.level, "mean_error": mean_error})
+        if self.count >= SEASONAL_PERIOD * 2:
+            cache.get(("seasonal_strength", SEASONAL_PERIOD), self.seasonal_strength)
+        return cache
+
+    def to_dict(self) -> Dict:
+        return {
+            "alpha": self.alpha,
+            "filter": self.filter.state_dict() if self.filter else None,
+            "tail": [round(v, 6) for v in self.tail],
+            "capacity": self.tail.capacity,
+            "count": self.count,
+            "last_timestamp": self.last_timestamp.isoformat() if self.last_timestamp else None,
+            "level": self.level,
+            "abs_dev_sum": self.abs_dev_sum,
+            "seasonal_sums": self.seasonal_sums,
+            "seasonal_counts": self.seasonal_counts
+        }
+
+    @classmethod
+    def from_dict(cls, metric: str, payload: Dict) -> "MetricState":
+        state = cls(metric, payload["alpha"], restore_filter(payload["filter"]),
+                    payload.get("capacity", TAIL_SIZE))
+        state.tail.extend(payload["tail"])
+        state.count = payload["count"]
+        if payload["last_timestamp"]:
+            state.last_timestamp = datetime.fromisoformat(payload["last_timestamp"])
+        state.level = payload["level"]
+        state.abs_dev_sum = payload["abs_dev_sum"]
+        state.seasonal_sums = payload["seasonal_sums"]
+        state.seasonal_counts = payload["seasonal_counts"]
+        return state
+
+
+def save_artifact(path: str, states: Dict[str, MetricState], params: Dict, cursor: Optional[int] = None):
+    """保存所有指标的状态；cursor 为已折叠到的历史存储序号（使用分段历史存储时）"""
+    payload = {
+        "format": ARTIFACT_FORMAT,
+        "version": ARTIFACT_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "params": params,
+        "cursor": cursor,
+        "metrics": {metric: state.to_dict() for metric, state in states.items()}
+    }
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def load_artifact(path: str) -> Dict:
+    """加载状态文件，返回 {"params": ..., "cursor": ..., "states": {指标: MetricState}}"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        payload = json.load(f)
+    if payload.get("format") != ARTIFACT_FORMAT or payload.get("version") != ARTIFACT_VERSION:
+        raise ValueError(f"不支持的模型状态文件: {payload.get('format')} v{payload.get('version')}")
+    return {
+        "params": payload["params"],
+        "cursor": payload.get("cursor"),
+        "states": {metric: MetricState.from_dict(metric, state) for metric, state in payload["metrics"].items()}
+    }
+
+
+def records_after(data: List[Dict], timestamp: Optional[datetime]) -> List[Dict]:
+    """按时间有序的历史记录中，严格晚于 timestamp 的尾部记录（从末尾向前扫描）"""
+    if timestamp is None:
+        return data
+    start = len(data)
+    while start > 0:
+        try:
+            current = datetime.fromisoformat(data[start - 1]['timestamp'].replace('Z', '+00:00'))
+        except (KeyError, ValueError, AttributeError):
+            start -= 1
+            continue
+        if current <= timestamp:
+            break
+        start -= 1
+    return data[start:]
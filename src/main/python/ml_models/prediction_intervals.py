@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+残差自助法预测区间
+用生成点预测的同一个模型（同样的参数）在滚动回测原点上重新预测，
+得到该模型真实的 h 步误差轨迹（误差随预测步自然累积）；
+对误差轨迹整条做有放回抽样叠加到点预测上，所有指标在同一个数组中批量模拟，
+输出指标原始单位下的分位数区间（默认P10/P50/P90）。
+历史太短、回测原点不足时退回一步残差的AR(1)误差累积模拟。
+"""
+
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+from hyperparameter_tuning import backtest_origins
+
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+
+# 单次模拟的数组元素上限（路径数 × 步数），超过时自动减少路径数以控制延迟
+MAX_SIMULATION_CELLS = 4_000_000
+
+# 回测原点数（即可抽样的误差轨迹条数）、最少原点数、每个原点重新预测时使用的最近历史长度。
+# 逐原点重新预测的模型开销与原点数成正比：集成/线性模型在 24 步、200 个原点时约 0.2 秒；
+# GBDT 不逐原点重新训练，复用点预测时训练好的模型，对所有原点一次递归预测
+RESIDUAL_ORIGINS = 200
+MIN_ORIGINS = 8
+RESIDUAL_HISTORY = 720
+
+
+def backtest_residuals(series: Sequence[Sequence[float]], forecaster: Callable, horizon: int,
+                       min_history: int = 96, n_origins: int = RESIDUAL_ORIGINS,
+                       batch: bool = False) -> Optional[np.ndarray]:
+    """
+    滚动原点回测：forecaster(origin) 返回只用 origin 之前数据做出的 (序列数, horizon) 预测；
+    batch 为 True 时 forecaster(原点数组) 一次返回 (序列数, 原点数, horizon)
+    series 为尾部对齐的各序列；返回 (序列数, 原点数, horizon) 的误差（真实值 - 预测值），原点不足时返回None
+    """
+    n = min(len(s) for s in series)
+    origins = np.asarray(backtest_origins(n, horizon, n_origins, min_history, stride=max(1, horizon // 8)))
+    if len(origins) < MIN_ORIGINS:
+        return None
+    actual = np.column_stack([np.asarray(list(s), dtype=float)[-n:] for s in series]).T
+    if batch:
+        predictions = np.asarray(forecaster(origins), dtype=float)[:, :, :horizon]
+    else:
+        predictions = np.stack([np.asarray(forecaster(origin), dtype=float)[:, :horizon] for origin in origins],
+                               axis=1)
+    return actual[:, origins[:, None] + np.arange(horizon)] - predictions
+
+
+def fit_residual_model(values: Sequence[float], alpha: float = 0.3, window: int = 720) -> Dict:
+    """退回模型：指数平滑一步残差的AR(1)系数和去相关后的新息"""
+    y = np.asarray(list(values)[-window:], dtype=float)
+    if y.size < 3:
+        return {"innovations": np.zeros(1), "phi": 0.0}
+
+    residuals = np.empty(y.size - 1)
+    level = y[0]
+    for i in range(1, y.size):
+        residuals[i - 1] = y[i] - level
+        level = alpha * y[i] + (1 - alpha) * level
+
+    denom = float(np.dot(residuals[:-1], residuals[:-1]))
+    phi = float(np.dot(residuals[1:], residuals[:-1]) / denom) if denom > 1e-12 else 0.0
+    phi = max(-0.99, min(0.99, phi))
+    innovations = residuals[1:] - phi * residuals[:-1]
+    innovations -= innovations.mean()
+    return {"innovations": innovations, "phi": phi}
+
+
+def bootstrap_intervals(point_forecasts: Sequence[Sequence[float]], residual_models: Sequence[Dict],
+                        n_paths: int = 2000, quantiles: Sequence[float] = DEFAULT_QUANTILES,
+                        seed: Optional[int] = None) -> np.ndarray:
+    """
+    所有指标、所有预测步在一个 (路径, 指标, 步数) 数组中模拟，一次求分位数；
+    residual_models 每项为 {"errors": (原点, 步数)} 或退回模型。各指标的误差轨迹用同一组随机数抽样，
+    回测原点相同时取的是同一时刻的误差，保留指标之间的相关性
+    返回形状为 (分位数, 指标, 步数) 的数组，步数不足的指标以NaN补齐
+    """
+    n_metrics = len(point_forecasts)
+    horizon = max((len(p) for p in point_forecasts), default=0)
+    if n_metrics == 0 or horizon == 0:
+        return np.empty((len(quantiles), n_metrics, horizon))
+    n_paths = max(10, min(n_paths, MAX_SIMULATION_CELLS // (horizon * n_metrics)))
+
+    rng = np.random.default_rng(seed)
+    centers = np.zeros((n_metrics, horizon))
+    valid = np.zeros((n_metrics, horizon), dtype=bool)
+    for m, forecast in enumerate(point_forecasts):
+        centers[m, :len(forecast)] = forecast
+        valid[m, :len(forecast)] = True
+
+    errors = np.zeros((n_paths, n_metrics, horizon))
+    draws = rng.random(n_paths)
+    fallback = []
+    for m, model in enumerate(residual_models):
+        trajectories = model.get("errors")
+        if trajectories is None:
+            fallback.append(m)
+            continue
+        # 整条误差轨迹抽样，保留各步误差之间的相关性
+        steps = min(horizon, trajectories.shape[1])
+        errors[:, m, :steps] = trajectories[(draws * trajectories.shape[0]).astype(int), :steps]
+        valid[m, steps:] = False
+
+    if fallback:
+        # 退回：一步误差按AR(1)递推后逐步累积（点预测不随新信息修正，误差逐步叠加）
+        phi = np.array([residual_models[m]["phi"] for m in fallback])
+        shocks = np.stack([
+            residual_models[m]["innovations"][rng.integers(0, max(1, residual_models[m]["innovations"].size),
+                                                           (n_paths, horizon))]
+            for m in fallback
+        ], axis=1)
+        current = np.zeros((n_paths, len(fallback)))
+        steps = np.empty_like(shocks)
+        for h in range(horizon):
+            current = phi * current + shocks[:, :, h]
+            steps[:, :, h] = current
+        errors[:, fallback, :] = np.cumsum(steps, axis=2)
+
+    bands = np.quantile(centers[None] + errors, quantiles, axis=0)
+    bands[:, ~valid] = np.nan
+    return bands
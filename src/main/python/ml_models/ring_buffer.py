@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+定长环形缓冲区
+底层为预分配的 array('d')，追加为 O(1) 覆盖写，内存固定为 capacity 个 double；
+支持 len、正负下标、切片和迭代（按时间先后），可直接作为模型的 values 序列读取。
+"""
+
+from array import array
+from typing import Iterable, Iterator, Union
+
+
+class RingBuffer:
+    """保留最近 capacity 个值的环形缓冲区"""
+
+    def __init__(self, capacity: int, values: Iterable[float] = ()):
+        if capacity < 1:
+            raise ValueError(f"环形缓冲区容量必须为正: {capacity}")
+        self.capacity = capacity
+        self._data = array('d', bytes(8 * capacity))
+        # _start 为最早元素的位置
+        self._start = 0
+        self._size = 0
+        for value in values:
+            self.append(value)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, value: float):
+        if self._size < self.capacity:
+            self._data[(self._start + self._size) % self.capacity] = value
+            self._size += 1
+        else:
+            self._data[self._start] = value
+            self._start = (self._start + 1) % self.capacity
+
+    def extend(self, values: Iterable[float]):
+        for value in values:
+            self.append(value)
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._size)
+            if step != 1:
+                return array('d', (self[i] for i in range(start, stop, step)))
+            if stop <= start:
+                return array('d')
+            begin = (self._start + start) % self.capacity
+            end = begin + (stop - start)
+            if end <= self.capacity:
+                return self._data[begin:end]
+            return self._data[begin:] + self._data[:end - self.capacity]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("环形缓冲区下标越界")
+        return self._data[(self._start + index) % self.capacity]
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self[:])
+
+    def tolist(self):
+        return self[:].tolist()
+
+    def __repr__(self) -> str:
+        return f"RingBuffer(capacity={self.capacity}, size={self._size})"
@@ -10,16 +10,22 @@ import sys
 import argparse
 from datetime import datetime, timedelta
 import math
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
+
+from time_index import load_range
 
 class SimpleCCUPredictor:
     def __init__(self):
         self.model_name = "Simple Linear Regression"
         self.version = "1.0.0"
         
-    def load_data(self, data_path: str) -> List[Dict]:
-        """加载历史数据"""
+    def load_data(self, data_path: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """加载历史数据；指定 start/end 时通过时间索引只读取 [start, end) 区间"""
         try:
+            if start or end:
+                data = load_range(data_path, start, end)
+                print(f"成功加载 {len(data)} 条历史记录 (时间区间 {start or '开始'} 至 {end or '最新'})")
+                return data
             with open(data_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
             print(f"成功加载 {len(data)} 条历史记录")
@@ -27,7 +33,7 @@ class SimpleCCUPredictor:
         except FileNotFoundError:
             print(f"错误: 数据文件不存在 {data_path}")
             return []
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, ValueError):
             print(f"错误: 数据文件格式错误 {data_path}")
             return []
     
@@ -176,6 +182,8 @@ def main():
     parser.add_argument('--metrics', type=str, default='co2_capture_rate,methanol_yield,energy_consumption', 
                        help='要预测的指标列表（逗号分隔）')
     parser.add_argument('--horizon', type=int, default=24, help='预测时长（小时）')
+    parser.add_argument('--start', type=str, help='只使用该时间（含）之后的历史数据，ISO格式')
+    parser.add_argument('--end', type=str, help='只使用该时间（不含）之前的历史数据，ISO格式')
     
     args = parser.parse_args()
     
@@ -187,7 +195,7 @@ def main():
         predictor = SimpleCCUPredictor()
         
         # 加载数据
-        data = predictor.load_data(args.data)
+        data = predictor.load_data(args.data, args.start, args.end)
         if not data:
             sys.exit(1)
         
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式异常值过滤器
+单遍扫描，基于滑动窗口的局部统计量识别并替换异常点：
+- zscore: Welford滑动均值/方差，O(1)更新；移除旧值的抵消误差通过周期性按窗口重算消除
+- mad: 滑动中位数/MAD，可按名次访问的跳表维护有序窗口，插入/删除/取中位数 O(log w)，
+  是否异常只需比较 |x - 中位数| 小于阈值半径的元素个数与 MAD 的名次，两次名次查询 O(log w)
+"""
+
+import math
+import random
+from array import array
+from collections import deque
+from typing import Dict, Iterable, Iterator, Optional
+
+# 正态分布下 MAD 与标准差的换算系数
+MAD_SCALE = 1.4826
+
+SUPPORTED_FILTERS = ["mad", "zscore", "none"]
+
+# 平方和相对均值平方低于该比例时视为近似平坦窗口，由窗口重算，避免抵消误差被当成真实波动
+REBASE_TOLERANCE = 1e-9
+
+
+class RollingZScoreFilter:
+    """滑动窗口z-score过滤器（Welford增量均值/方差）"""
+
+    def __init__(self, window: int = 48, threshold: float = 3.0, min_periods: Optional[int] = None):
+        self.window = max(2, window)
+        self.threshold = threshold
+        self.min_periods = min_periods if min_periods is not None else max(2, self.window // 4)
+        self._window = deque()
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._pops = 0
+
+    def _recompute(self):
+        """由窗口内的原始值精确重算均值和平方和"""
+        n = len(self._window)
+        self._mean = sum(self._window) / n if n else 0.0
+        self._m2 = sum((v - self._mean) ** 2 for v in self._window)
+        self._pops = 0
+
+    def _push(self, value: float):
+        self._window.append(value)
+        n = len(self._window)
+        delta = value - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (value - self._mean)
+
+    def _pop(self):
+        value = self._window.popleft()
+        n = len(self._window)
+        if n == 0:
+            self._mean = 0.0
+            self._m2 = 0.0
+            return
+        delta = value - self._mean
+        self._mean -= delta / n
+        self._m2 -= delta * (value - self._mean)
+        # 大值离开窗口后的抵消误差会留下虚假的方差：近似平坦时立即重算，否则每滚动一个窗口重算一次（均摊O(1)）
+        self._pops += 1
+        if self._pops >= self.window or (self._m2 != 0.0 and
+                                         self._m2 <= REBASE_TOLERANCE * n * (self._mean ** 2 + 1.0)):
+            self._recompute()
+
+    def update(self, value: float) -> float:
+        """输入一个原始值，返回过滤后的值"""
+        n = len(self._window)
+        result = value
+        if n >= self.min_periods:
+            std = (max(self._m2, 0.0) / n) ** 0.5
+            if std > 1e-12 and abs(value - self._mean) > self.threshold * std:
+                # 用局部均值替换异常值
+                result = self._mean
+
+        # 窗口中保留原始值，真实的水平变化会随窗口滚动被接受
+        self._push(value)
+        if len(self._window) > self.window:
+            self._pop()
+        return result
+
+    def filter(self, values: Iterable[float]) -> Iterator[float]:
+        for value in values:
+            yield self.update(value)
+
+    def state_dict(self) -> Dict:
+        """可序列化的过滤器状态（窗口内的原始值），均值/方差在恢复时重算"""
+        return {"method": "zscore", "window": self.window, "threshold": self.threshold,
+                "min_periods": self.min_periods, "values": list(self._window)}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "RollingZScoreFilter":
+        instance = cls(state["window"], state["threshold"], state["min_periods"])
+        for value in state["values"]:
+            instance._push(value)
+        return instance
+
+
+def _kth_of_two(a_at, a_len: int, b_at, b_len: int, k: int) -> float:
+    """两个有序序列并集中的第k小元素（k从0开始），O(log(min(a, b)))"""
+    total = k + 1
+    lo, hi = max(0, total - b_len), min(a_len, total)
+    while lo <= hi:
+        i = (lo + hi) // 2
+        j = total - i
+        if i < a_len and j > 0 and b_at(j - 1) > a_at(i):
+            lo = i + 1
+        elif i > 0 and j < b_len and a_at(i - 1) > b_at(j):
+            hi = i - 1
+        else:
+            left_a = a_at(i - 1) if i > 0 else float('-inf')
+            left_b = b_at(j - 1) if j > 0 else float('-inf')
+            return max(left_a, left_b)
+    return 0.0
+
+
+class _SkipNode:
+    __slots__ = ("value", "next", "width")
+
+    def __init__(self, value: float, levels: int):
+        self.value = value
+        self.next = [None] * levels
+        # width[level]: 沿该层指针前进跨过的元素个数
+        self.width = [1] * levels
+
+
+class IndexableSkipList:
+    """可按名次访问的有序多重集合（跳表，每层指针记录跨度），插入/删除/取第k小均为期望 O(log n)"""
+
+    def __init__(self, expected_size: int = 64, seed: int = 0):
+        self.levels = max(1, int(math.log2(max(2, expected_size))) + 1)
+        self._tail = _SkipNode(float('inf'), 0)
+        self._head = _SkipNode(float('-inf'), self.levels)
+        self._head.next = [self._tail] * self.levels
+        # 层高只影响性能不影响结果，固定种子使运行可复现
+        self._random = random.Random(seed)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, k: int) -> float:
+        """第k小的元素（k从0开始）"""
+        if not 0 <= k < self._size:
+            raise IndexError(k)
+        node = self._head
+        k += 1
+        for level in range(self.levels - 1, -1, -1):
+            while node.width[level] <= k:
+                k -= node.width[level]
+                node = node.next[level]
+        return node.value
+
+    def __iter__(self) -> Iterator[float]:
+        node = self._head.next[0]
+        while node is not self._tail:
+            yield node.value
+            node = node.next[0]
+
+    def rank(self, value: float, inclusive: bool = False) -> int:
+        """小于（inclusive 时小于等于）value 的元素个数"""
+        node = self._head
+        count = 0
+        for level in range(self.levels - 1, -1, -1):
+            if inclusive:
+                while node.next[level].value <= value:
+                    count += node.width[level]
+                    node = node.next[level]
+            else:
+                while node.next[level].value < value:
+                    count += node.width[level]
+                    node = node.next[level]
+        return count
+
+    def insert(self, value: float):
+        chain = [self._head] * self.levels
+        steps = [0] * self.levels
+        node = self._head
+        for level in range(self.levels - 1, -1, -1):
+            while node.next[level].value <= value:
+                steps[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        height = 1
+        while height < self.levels and self._random.random() < 0.5:
+            height += 1
+        new = _SkipNode(value, height)
+        offset = 0
+        for level in range(height):
+            prev = chain[level]
+            new.next[level] = prev.next[level]
+            prev.next[level] = new
+            new.width[level] = prev.width[level] - offset
+            prev.width[level] = offset + 1
+            offset += steps[level]
+        for level in range(height, self.levels):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, value: float):
+        """删除一个等于 value 的元素，不存在时抛出 KeyError"""
+        chain = [self._head] * self.levels
+        node = self._head
+        for level in range(self.levels - 1, -1, -1):
+            while node.next[level].value < value:
+                node = node.next[level]
+            chain[level] = node
+        target = chain[0].next[0]
+        if target is self._tail or target.value != value:
+            raise KeyError(value)
+
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self.levels):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+
+class RollingMADFilter:
+    """滑动窗口中位数/MAD过滤器"""
+
+    def __init__(self, window: int = 48, threshold: float = 3.0, min_periods: Optional[int] = None):
+        self.window = max(3, window)
+        self.threshold = threshold
+        self.min_periods = min_periods if min_periods is not None else max(3, self.window // 4)
+        self._window = deque()
+        self._sorted = IndexableSkipList(self.window + 1)
+
+    def median(self) -> float:
+        s = self._sorted
+        n = len(s)
+        mid = n // 2
+        if n % 2:
+            return s[mid]
+        return (s[mid - 1] + s[mid]) / 2
+
+    def mad(self, median: float) -> float:
+        """
+        中位数绝对偏差：有序窗口按中位数切成两段单调的偏差序列，二分取第k小；
+        偏差序列直接按名次从跳表读取，中位数移动时无需维护另一份按偏差排序的结构
+        """
+        s = self._sorted
+        n = len(s)
+        split = s.rank(median)
+
+        def below(j):
+            return median - s[split - 1 - j]
+
+        def above(j):
+            return s[split + j] - median
+
+        a_len, b_len = split, n - split
+        if n % 2:
+            return _kth_of_two(below, a_len, above, b_len, n // 2)
+        return (_kth_of_two(below, a_len, above, b_len, n // 2 - 1) +
+                _kth_of_two(below, a_len, above, b_len, n // 2)) / 2
+
+    def _exceeds(self, value: float, median: float) -> bool:
+        """按定义计算MAD后判定 |value - median| > threshold × MAD_SCALE × MAD"""
+        scale = MAD_SCALE * self.mad(median)
+        return scale > 1e-12 and abs(value - median) > self.threshold * scale
+
+    def is_outlier(self, value: float, median: float) -> bool:
+        """
+        与 _exceeds 等价的判定，但不求MAD本身：MAD 是偏差的第 n//2 小（偶数窗口取两个中间名次的均值），
+        因此 MAD < 半径 等价于偏差小于半径的元素个数超过 n//2，个数由跳表两次名次查询得到；
+        只有偶数窗口且个数恰好落在两个中间名次之间时才退回精确计算
+        """
+        if self.threshold <= 0:
+            return self._exceeds(value, median)
+        s = self._sorted
+        n = len(s)
+        k = n // 2
+        radius = abs(value - median) / (self.threshold * MAD_SCALE)
+        below = s.rank(median + radius) - s.rank(median - radius, inclusive=True)
+        if below < k or (n % 2 and below == k):
+            return False
+        # MAD_SCALE × MAD > 1e-12 的条件同样换成偏差计数
+        eps = 1e-12 / MAD_SCALE
+        tiny = s.rank(median + eps, inclusive=True) - s.rank(median - eps)
+        if n % 2:
+            return tiny <= k
+        if below == k or tiny == k:
+            return self._exceeds(value, median)
+        return tiny < k
+
+    def update(self, value: float) -> float:
+        """输入一个原始值，返回过滤后的值"""
+        result = value
+        if len(self._window) >= self.min_periods:
+            med = self.median()
+            if self.is_outlier(value, med):
+                # 用局部中位数替换异常值
+                result = med
+
+        self._window.append(value)
+        self._sorted.insert(value)
+        if len(self._window) > self.window:
+            self._sorted.remove(self._window.popleft())
+        return result
+
+    def filter(self, values: Iterable[float]) -> Iterator[float]:
+        for value in values:
+            yield self.update(value)
+
+    def state_dict(self) -> Dict:
+        """可序列化的过滤器状态（窗口内的原始值），有序窗口在恢复时重建"""
+        return {"method": "mad", "window": self.window, "threshold": self.threshold,
+                "min_periods": self.min_periods, "values": list(self._window)}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "RollingMADFilter":
+        instance = cls(state["window"], state["threshold"], state["min_periods"])
+        instance._window.extend(state["values"])
+        for value in state["values"]:
+            instance._sorted.insert(value)
+        return instance
+
+
+def create_filter(method: str = "mad", window: int = 48, threshold: float = 3.0):
+    """按名称创建过滤器，method为none时返回None"""
+    if method == "mad":
+        return RollingMADFilter(window, threshold)
+    if method == "zscore":
+        return RollingZScoreFilter(window, threshold)
+    if method == "none":
+        return None
+    raise ValueError(f"不支持的异常值过滤方法: {method}")
+
+
+def restore_filter(state: Optional[Dict]):
+    """由 state_dict 恢复过滤器，state 为None时返回None"""
+    if state is None:
+        return None
+    if state["method"] == "mad":
+        return RollingMADFilter.from_state(state)
+    if state["method"] == "zscore":
+        return RollingZScoreFilter.from_state(state)
+    raise ValueError(f"不支持的异常值过滤方法: {state['method']}")
+
+
+def filter_series(values: Iterable[float], method: str = "mad", window: int = 48,
+                  threshold: float = 3.0) -> array:
+    """单遍过滤整条序列，直接写入紧凑的 array('d') 作为模型输入"""
+    outlier_filter = create_filter(method, window, threshold)
+    if outlier_filter is None:
+        return array('d', values)
+    return array('d', outlier_filter.filter(values))
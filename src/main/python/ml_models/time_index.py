@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史数据的时间索引
+对 JSON 数组形式的历史数据文件分块扫描（驻留内存与单条记录和块大小相关，与文件大小无关），
+建立有序时间戳索引（每条记录的字节偏移），
+持久化为数据文件旁的 .tidx 边车文件；[start, end) 区间和最近N条查询用二分查找定位，
+只读取并解析对应的字节片段，开销与窗口大小相关而与文件大小无关。
+数据文件在末尾追加记录后，索引从最后一条已索引记录之后增量扫描，不重新扫描整个文件。
+"""
+
+import codecs
+import json
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+INDEX_SUFFIX = ".tidx"
+INDEX_MAGIC = b"CTIX"
+INDEX_VERSION = 1
+_HEADER = struct.Struct("<4sBqqQ?")
+
+# 建立索引时每次读取的字节数
+SCAN_CHUNK = 1 << 20
+
+
+def parse_epoch(value: str) -> float:
+    """ISO时间字符串 -> 时间戳（秒），与索引中的时间戳口径一致"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+class TimeIndex:
+    """有序时间戳 + 每条记录的字节区间"""
+
+    def __init__(self, epochs: array, starts: array, ends: array, source_size: int, source_mtime: int,
+                 is_sorted: bool = True):
+        self.epochs = epochs
+        self.starts = starts
+        self.ends = ends
+        self.source_size = source_size
+        self.source_mtime = source_mtime
+        self.is_sorted = is_sorted
+
+    def __len__(self):
+        return len(self.epochs)
+
+    @classmethod
+    def build(cls, data_path: str) -> "TimeIndex":
+        """分块扫描一次数据文件，记录每条记录的时间戳和字节区间"""
+        stat = os.stat(data_path)
+        epochs, starts, ends = array('d'), array('q'), array('q')
+        _scan_file(data_path, 0, epochs, starts, ends)
+        is_sorted = all(epochs[i] <= epochs[i + 1] for i in range(len(epochs) - 1))
+        return cls(epochs, starts, ends, stat.st_size, stat.st_mtime_ns, is_sorted)
+
+    def extend(self, data_path: str) -> bool:
+        """
+        数据文件只在末尾追加了记录时，从最后一条已索引记录之后增量扫描并更新索引；
+        首尾已索引记录的时间戳对不上（文件被改写）时返回False，需要完整重建
+        """
+        stat = os.stat(data_path)
+        if not len(self.epochs) or stat.st_size < self.ends[-1]:
+            return False
+        with open(data_path, 'rb') as f:
+            for i in (0, len(self.epochs) - 1):
+                f.seek(self.starts[i])
+                try:
+                    record = json.loads(f.read(self.ends[i] - self.starts[i]))
+                    if parse_epoch(record['timestamp']) != self.epochs[i]:
+                        return False
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    return False
+
+        count = len(self.epochs)
+        _scan_file(data_path, self.ends[-1], self.epochs, self.starts, self.ends)
+        self.is_sorted = self.is_sorted and all(self.epochs[i] <= self.epochs[i + 1]
+                                                for i in range(count - 1, len(self.epochs) - 1))
+        self.source_size = stat.st_size
+        self.source_mtime = stat.st_mtime_ns
+        return True
+
+    def save(self, index_path: str):
+        with open(index_path, 'wb') as f:
+            f.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.source_size, self.source_mtime,
+                                 len(self.epochs), self.is_sorted))
+            self.epochs.tofile(f)
+            self.starts.tofile(f)
+            self.ends.tofile(f)
+
+    @classmethod
+    def load(cls, index_path: str) -> "TimeIndex":
+        with open(index_path, 'rb') as f:
+            magic, version, size, mtime, count, is_sorted = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                raise ValueError(f"不支持的时间索引文件: {index_path}")
+            epochs, starts, ends = array('d'), array('q'), array('q')
+            epochs.fromfile(f, count)
+            starts.fromfile(f, count)
+            ends.fromfile(f, count)
+        return cls(epochs, starts, ends, size, mtime, is_sorted)
+
+    def matches(self, data_path: str) -> bool:
+        """索引是否与当前数据文件对应（大小和修改时间一致）"""
+        stat = os.stat(data_path)
+        return stat.st_size == self.source_size and stat.st_mtime_ns == self.source_mtime
+
+    def range(self, start: Optional[float] = None, end: Optional[float] = None) -> Tuple[int, int]:
+        """[start, end) 对应的记录下标区间"""
+        lo = bisect_left(self.epochs, start) if start is not None else 0
+        hi = bisect_left(self.epochs, end) if end is not None else len(self.epochs)
+        return lo, max(lo, hi)
+
+    def last(self, n: int) -> Tuple[int, int]:
+        """最近 n 条记录的下标区间"""
+        return max(0, len(self.epochs) - n), len(self.epochs)
+
+    def read(self, data_path: str, lo: int, hi: int) -> List[Dict]:
+        """只读取并解析 [lo, hi) 记录对应的字节片段"""
+        if lo >= hi:
+            return []
+        with open(data_path, 'rb') as f:
+            f.seek(self.starts[lo])
+            chunk = f.read(self.ends[hi - 1] - self.starts[lo])
+        return json.loads(b'[' + chunk + b']')
+
+
+def _scan_file(data_path: str, byte_pos: int, epochs: array, starts: array, ends: array):
+    """
+    从文件字节偏移 byte_pos 开始逐块读取并扫描记录，把时间戳和字节区间追加到索引数组；
+    跨块的记录在读入下一块后重新解析，同时驻留的只有当前块和未解析完的记录
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    text, pos, eof = '', 0, False
+    with open(data_path, 'rb') as f:
+        f.seek(byte_pos)
+        while True:
+            # 跳过数组开头、空白和逗号
+            skipped = pos
+            while pos < len(text) and text[pos] in ' \t\r\n,[\ufeff':
+                pos += 1
+            byte_pos += len(text[skipped:pos].encode('utf-8'))
+            if pos < len(text) and text[pos] == ']':
+                break
+            try:
+                record, end = decoder.raw_decode(text, pos)
+            except json.JSONDecodeError:
+                # 缓冲区已耗尽或末尾是不完整的记录：读入下一块后重试
+                if eof:
+                    if pos >= len(text):
+                        break
+                    raise
+                chunk = f.read(SCAN_CHUNK)
+                eof = not chunk
+                text, pos = text[pos:] + utf8.decode(chunk, final=eof), 0
+                continue
+
+            record_bytes = len(text[pos:end].encode('utf-8'))
+            try:
+                epochs.append(parse_epoch(record['timestamp']))
+            except (KeyError, ValueError, TypeError, AttributeError):
+                epochs.append(float('nan'))
+            starts.append(byte_pos)
+            ends.append(byte_pos + record_bytes)
+            byte_pos += record_bytes
+            pos = end
+
+
+def get_index(data_path: str) -> TimeIndex:
+    """加载边车索引；数据文件只追加了记录时增量扩展，不存在或被改写时重建，并尽量持久化"""
+    index_path = data_path + INDEX_SUFFIX
+    index = None
+    if os.path.exists(index_path):
+        try:
+            index = TimeIndex.load(index_path)
+            if index.matches(data_path):
+                return index
+            if not index.extend(data_path):
+                index = None
+        except (OSError, ValueError, struct.error, EOFError, UnicodeDecodeError):
+            index = None
+    if index is None:
+        index = TimeIndex.build(data_path)
+    try:
+        index.save(index_path)
+    except OSError:
+        # 数据目录只读时仅在内存中使用
+        pass
+    return index
+
+
+def load_range(data_path: str, start: Optional[str] = None, end: Optional[str] = None,
+               last: Optional[int] = None) -> List[Dict]:
+    """按时间区间 [start, end) 和/或最近N条读取历史记录"""
+    index = get_index(data_path)
+    start_epoch = parse_epoch(start) if start else None
+    end_epoch = parse_epoch(end) if end else None
+
+    if not index.is_sorted:
+        # 记录未按时间排序时无法二分，退回全量读取后过滤
+        with open(data_path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        selected = [r for r, t in zip(records, index.epochs)
+                    if (start_epoch is None or t >= start_epoch) and (end_epoch is None or t < end_epoch)]
+        return selected[-last:] if last else selected
+
+    lo, hi = index.range(start_epoch, end_epoch)
+    if last:
+        lo = max(lo, hi - last)
+    return index.read(data_path, lo, hi)
+
+
+def iter_range(data_path: str, start: Optional[str] = None, end: Optional[str] = None,
+               chunk_size: int = 4096) -> Iterator[Dict]:
+    """按时间区间 [start, end) 分块流式读取记录，同时驻留的记录不超过 chunk_size 条"""
+    index = get_index(data_path)
+    if not index.is_sorted:
+        yield from load_range(data_path, start, end)
+        return
+    lo, hi = index.range(parse_epoch(start) if start else None, parse_epoch(end) if end else None)
+    for chunk_lo in range(lo, hi, chunk_size):
+        yield from index.read(data_path, chunk_lo, min(hi, chunk_lo + chunk_size))
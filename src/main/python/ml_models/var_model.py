@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量自回归（VAR）联合预测
+所有指标共享一个滞后设计矩阵（sliding_window_view 零拷贝视图），
+可选外生变量为分时电价和小时周期编码（未来值由时间戳已知），
+各指标的系数在一次岭回归求解中同时得到，多步预测递归展开。
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from feature_store import tou_price
+
+# 自回归滞后阶（小时），24 捕捉日周期
+VAR_LAGS = (1, 2, 3, 24)
+
+# 最多使用的训练行数（最近90天）
+MAX_TRAIN_ROWS = 2160
+
+RIDGE = 1e-3
+
+
+def exogenous_features(hours: np.ndarray) -> np.ndarray:
+    """外生变量：分时电价、小时正弦/余弦"""
+    hours = np.asarray(hours)
+    return np.column_stack([tou_price(hours), np.sin(2 * np.pi * hours / 24), np.cos(2 * np.pi * hours / 24)])
+
+
+class VARModel:
+    """带外生变量的VAR，所有指标一次求解"""
+
+    def __init__(self, lags: Sequence[int] = VAR_LAGS, exogenous: bool = True,
+                 max_train_rows: int = MAX_TRAIN_ROWS, ridge: float = RIDGE):
+        self.lags = tuple(sorted(lags))
+        self.exogenous = exogenous
+        self.max_train_rows = max_train_rows
+        self.ridge = ridge
+        self.coef = None
+        self.mean = None
+        self.scale = None
+        self.residual_std = None
+
+    @property
+    def order(self) -> int:
+        return self.lags[-1]
+
+    def _design(self, lagged: List[np.ndarray], exog: Optional[np.ndarray]) -> np.ndarray:
+        parts = [np.ones((len(lagged[0]), 1))] + lagged
+        if exog is not None:
+            parts.append(exog)
+        return np.hstack(parts)
+
+    def fit(self, Y: np.ndarray, hours: np.ndarray) -> "VARModel":
+        """Y: (n, k) 已对齐的指标矩阵，hours: (n,) 每行的小时"""
+        n, k = Y.shape
+        p = self.order
+        if n <= p + len(self.lags) * k + 4:
+            raise ValueError(f"数据不足以拟合VAR（{n} 行）")
+
+        self.mean = Y.mean(axis=0)
+        self.scale = Y.std(axis=0)
+        self.scale[self.scale < 1e-12] = 1.0
+        Z = (Y - self.mean) / self.scale
+
+        # windows[i] 覆盖 Z[i:i+p+1]，目标行为 i+p；滞后 l 的取值在窗口位置 p-l
+        windows = sliding_window_view(Z, p + 1, axis=0)
+        first = max(0, len(windows) - self.max_train_rows)
+        windows = windows[first:]
+        target_rows = np.arange(first + p, n)
+
+        lagged = [windows[:, :, p - lag] for lag in self.lags]
+        exog = exogenous_features(hours[target_rows]) if self.exogenous else None
+        X = self._design(lagged, exog)
+        T = Z[target_rows]
+
+        # 岭回归正规方程，截距不惩罚；k 个指标共用一次分解
+        gram = X.T @ X
+        penalty = np.full(X.shape[1], self.ridge * len(X))
+        penalty[0] = 0.0
+        gram[np.diag_indices_from(gram)] += penalty
+        self.coef = np.linalg.solve(gram, X.T @ T)
+
+        residuals = T - X @ self.coef
+        self.residual_std = residuals.std(axis=0) * self.scale
+        return self
+
+    def forecast(self, Y: np.ndarray, base_time: datetime, horizon: int) -> np.ndarray:
+        """从 Y 的末尾递归预测 horizon 步，返回 (horizon, k)"""
+        p = self.order
+        history = list((Y[-p:] - self.mean) / self.scale)
+        future_hours = np.array([(base_time + timedelta(hours=i + 1)).hour for i in range(horizon)])
+        exog = exogenous_features(future_hours) if self.exogenous else None
+
+        out = np.empty((horizon, Y.shape[1]))
+        for step in range(horizon):
+            lagged = [history[-lag][None, :] for lag in self.lags]
+            x = self._design(lagged, exog[step:step + 1] if exog is not None else None)
+            z = (x @ self.coef)[0]
+            history.append(z)
+            out[step] = z
+        return out * self.scale + self.mean
+
+    def confidences(self, horizon: int) -> np.ndarray:
+        """按残差相对水平和步长平方根衰减的置信度，(horizon, k)"""
+        relative = self.residual_std / np.maximum(np.abs(self.mean), 1e-9)
+        steps = np.sqrt(np.arange(1, horizon + 1))[:, None]
+        return np.clip(1.0 - 2.0 * relative[None, :] * steps, 0.55, 0.95)
+
+
+def forecast_joint(series: Sequence[Sequence[float]], timestamps: Sequence[datetime], horizon: int,
+                   exogenous: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    多指标联合预测；各序列按尾部对齐到共同长度，timestamps 对应对齐后的各行
+    返回 (预测值 (horizon, k), 置信度 (horizon, k))
+    """
+    n = min(len(s) for s in series)
+    Y = np.column_stack([np.asarray(s, dtype=float)[-n:] for s in series])
+    hours = np.array([t.hour for t in timestamps[-n:]]) if len(timestamps) >= n else np.arange(n) % 24
+    model = VARModel(exogenous=exogenous).fit(Y, hours)
+    base_time = timestamps[-1] if timestamps else datetime.now()
+    return model.forecast(Y, base_time, horizon), model.confidences(horizon)
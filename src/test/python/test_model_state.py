@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""热启动模型状态的回归测试"""
+
+import os
+import random
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'main', 'python', 'ml_models'))
+from advanced_predictor import AdvancedCCUPredictor  # noqa: E402
+from forecast_models import SeriesCache  # noqa: E402
+from model_state import MetricState  # noqa: E402
+
+ALPHA = 0.3
+
+
+class MetricStateTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(1)
+        self.values = [50 + rng.gauss(0, 3) + (i % 24) * 0.2 for i in range(500)]
+        self.timestamps = [datetime(2024, 1, 1) + timedelta(hours=i) for i in range(500)]
+        self.decompose = AdvancedCCUPredictor().seasonal_decomposition
+
+    def fit(self, n):
+        return MetricState.fit("m", self.timestamps[:n], self.values[:n], ALPHA, "none", 24, self.decompose)
+
+    def test_warm_start_matches_cold_refit(self):
+        cold = self.fit(500)
+        warm = self.fit(300)
+        for timestamp, value in zip(self.timestamps[300:], self.values[300:]):
+            warm.update(timestamp, value)
+        self.assertAlmostEqual(warm.level, cold.level, places=9)
+        self.assertAlmostEqual(warm.abs_dev_sum, cold.abs_dev_sum, places=6)
+        self.assertEqual(warm.count, cold.count)
+
+    def test_mean_error_matches_series_cache(self):
+        state = self.fit(500)
+        expected = SeriesCache(self.values).smoothing_state(ALPHA)
+        actual = state.to_cache().smoothing_state(ALPHA)
+        self.assertAlmostEqual(actual["level"], expected["level"], places=9)
+        self.assertAlmostEqual(actual["mean_error"], expected["mean_error"], places=9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""分时电价运行计划优化的回归测试"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'main', 'python', 'ml_models'))
+from schedule_optimizer import ScheduleOptimizer  # noqa: E402
+
+HORIZON = 48
+UNIT = {"co2_capture_rate": [92.0] * HORIZON, "methanol_yield": [22.5] * HORIZON,
+        "energy_consumption": [3.75] * HORIZON}
+
+
+class ScheduleOptimizerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.optimizer = ScheduleOptimizer()
+        self.start = datetime(2024, 1, 1, 0)
+
+    def loads_by_price(self, unit):
+        loads = {}
+        for entry in unit["schedule"]:
+            loads.setdefault(entry["electricity_price"], []).append(entry["load"])
+        return {price: sum(values) / len(values) for price, values in loads.items()}
+
+    def test_load_moves_out_of_peak_hours(self):
+        unit = self.optimizer.optimize([UNIT], HORIZON, self.start, [1.0])["units"][0]
+        peak, normal, valley = (self.optimizer.generator.economic_params['electricity_price'][k]
+                                for k in ('peak', 'normal', 'valley'))
+        average = self.loads_by_price(unit)
+        self.assertTrue(unit["feasible"])
+        self.assertLess(average[peak], average[normal])
+        self.assertLess(average[normal], average[valley])
+        # 峰时段有停机小时，计划利润高于全程满负荷
+        self.assertIn(0.0, [e["load"] for e in unit["schedule"] if e["electricity_price"] == peak])
+        self.assertGreater(unit["total_profit"], unit["baseline_profit"])
+
+    def test_shutdown_only_from_minimum_load(self):
+        unit = self.optimizer.optimize([UNIT], HORIZON, self.start, [1.0])["units"][0]
+        loads = [1.0] + [e["load"] for e in unit["schedule"]]
+        for previous, current in zip(loads, loads[1:]):
+            if previous == 0.0 or current == 0.0:
+                self.assertIn(max(previous, current), (0.0, self.optimizer.min_load))
+            else:
+                self.assertLessEqual(abs(current - previous), 0.1 + 1e-9)
+
+    def test_purchased_hydrogen_keeps_full_load(self):
+        # 不考虑现场电解耗电时，边际电费始终低于甲醇售价，计划与满负荷基准一致
+        optimizer = ScheduleOptimizer(plant={"electrolysis_kwh": 0.0})
+        unit = optimizer.optimize([UNIT], HORIZON, self.start, [1.0])["units"][0]
+        self.assertEqual({e["load"] for e in unit["schedule"]}, {1.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
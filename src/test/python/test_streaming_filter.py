@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""流式异常值过滤器的回归测试"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'main', 'python', 'ml_models'))
+from streaming_filter import RollingMADFilter, RollingZScoreFilter, restore_filter  # noqa: E402
+
+
+class RollingZScoreFilterTest(unittest.TestCase):
+
+    def test_flat_window_after_large_values_leave(self):
+        # 大值离开窗口后，平坦窗口 [500, 500, 500] 的方差必须为0，正常读数不应被替换
+        outlier_filter = RollingZScoreFilter(window=3, threshold=3.0, min_periods=2)
+        for value in [1e7, -3e6, 123456.789, 500, 500, 500]:
+            outlier_filter.update(value)
+        self.assertEqual(list(outlier_filter._window), [500, 500, 500])
+        self.assertEqual(outlier_filter._m2, 0.0)
+        self.assertEqual(outlier_filter.update(52.1), 52.1)
+
+    def test_replaces_outlier_with_window_mean(self):
+        outlier_filter = RollingZScoreFilter(window=24, threshold=3.0)
+        for i in range(24):
+            outlier_filter.update(50.0 + (i % 3) * 0.1)
+        mean = outlier_filter._mean
+        self.assertEqual(outlier_filter.update(500.0), mean)
+
+    def test_state_round_trip(self):
+        outlier_filter = RollingZScoreFilter(window=5)
+        for value in [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]:
+            outlier_filter.update(value)
+        restored = restore_filter(outlier_filter.state_dict())
+        self.assertEqual(list(restored._window), list(outlier_filter._window))
+        self.assertAlmostEqual(restored._mean, outlier_filter._mean)
+
+
+class RollingMADFilterTest(unittest.TestCase):
+
+    def test_matches_sorted_window_definition(self):
+        values = [50.0 + ((i * 37) % 11) * 0.3 for i in range(300)] + [500.0, 50.2, -400.0, 50.1]
+        outlier_filter = RollingMADFilter(window=8, threshold=3.0)
+        window = []
+        for value in values:
+            expected = value
+            if len(window) >= outlier_filter.min_periods:
+                ordered = sorted(window)
+                n = len(ordered)
+                median = ordered[n // 2] if n % 2 else (ordered[n // 2 - 1] + ordered[n // 2]) / 2
+                deviations = sorted(abs(v - median) for v in ordered)
+                mad = deviations[n // 2] if n % 2 else (deviations[n // 2 - 1] + deviations[n // 2]) / 2
+                scale = 1.4826 * mad
+                if scale > 1e-12 and abs(value - median) > 3.0 * scale:
+                    expected = median
+            self.assertEqual(outlier_filter.update(value), expected)
+            window = (window + [value])[-8:]
+
+
+if __name__ == "__main__":
+    unittest.main()